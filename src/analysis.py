@@ -0,0 +1,209 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# Tests the effect of the subliminal priming on the ratings of the dilemmata.
+# Usage: python analysis.py [--store DIR] [--resamples N] [--processes N] [--seed N]
+
+from store import Store
+
+import argparse
+import json
+import multiprocessing
+
+import numpy
+
+# The covariates loaded from the DS-R and the emotional questionnaire
+DSR_COVARIATES = ['coreDisgust', 'animalReminderDisgust', 'contaminationDisgust', 'overallDisgust']
+EMOTION_COVARIATES = ['happiness', 'anger', 'sadness', 'disgust']
+
+def subject_table(store):
+    '''
+    Aggregates the stored results per subject.
+    :param Store store: The store of all sessions.
+    :return dict: Arrays of equal length with the subjects, their group, the mean ratings per condition and block and the covariates.
+    '''
+    dilemmata = store.load('dilemma')
+    subjects = sorted(set(dilemmata['subject'])) if 'subject' in dilemmata else []
+    table = dict((name, numpy.full(len(subjects), numpy.nan)) for name in ['primed', 'neutral', 'first', 'second', 'groupA'] + DSR_COVARIATES + EMOTION_COVARIATES)
+    table['subject'] = numpy.array(subjects)
+
+    for i, subject in enumerate(subjects):
+        rows = dilemmata['subject'] == subject
+        ratings = dilemmata['rating'][rows]
+        group = dilemmata['groupt'][rows][0] if 'groupt' in dilemmata else ''
+        half = len(ratings) // 2
+        first = numpy.arange(len(ratings)) < half
+
+        # Older sessions did not record the condition, it follows from the group then
+        if 'condition' in dilemmata and all(dilemmata['condition'][rows]):
+            primed = dilemmata['condition'][rows] == 'prime'
+        else:
+            primed = first if group == 'A' else ~first
+
+        table['groupA'][i] = 1.0 if group == 'A' else 0.0
+        table['primed'][i] = ratings[primed].mean()
+        table['neutral'][i] = ratings[~primed].mean()
+        table['first'][i] = ratings[first].mean()
+        table['second'][i] = ratings[~first].mean()
+
+    # Average the covariates over all rows of a subject
+    for trial_type, columns in [('dsr', DSR_COVARIATES), ('emotions', EMOTION_COVARIATES)]:
+        rows = store.load(trial_type, columns, subjects)
+        for i, subject in enumerate(subjects):
+            selected = rows['subject'] == subject if 'subject' in rows else []
+            for column in columns:
+                if column in rows and numpy.any(selected):
+                    table[column][i] = numpy.nanmean(rows[column][selected].astype(float))
+    return table
+
+def correlations(x, y):
+    '''
+    Calculates the Pearson correlation of many resampled pairs at once.
+    :param numpy.ndarray x: A R×N array.
+    :param numpy.ndarray y: A R×N array.
+    :return numpy.ndarray: The R correlations.
+    '''
+    x = x - x.mean(axis=1, keepdims=True)
+    y = y - y.mean(axis=1, keepdims=True)
+    return (x * y).sum(axis=1) / numpy.sqrt((x * x).sum(axis=1) * (y * y).sum(axis=1))
+
+def resample(task):
+    '''
+    Calculates a chunk of resampled statistics. Runs in a worker process.
+    :param tuple task: [kind, arrays, count, seed] with the kinds "sign" (sign-flip permutation of a mean), "shuffle" (permutation of a correlation),
+        "bootstrap_mean" and "bootstrap_correlation".
+    :return numpy.ndarray: The count statistics.
+    '''
+    kind, arrays, count, seed = task
+    random = numpy.random.RandomState(seed)
+    n = len(arrays[0])
+
+    if kind == 'sign':
+        signs = random.randint(0, 2, (count, n)) * 2 - 1
+        return (signs * arrays[0]).mean(axis=1)
+    elif kind == 'shuffle':
+        order = numpy.argsort(random.rand(count, n), axis=1)
+        return correlations(numpy.tile(arrays[0], (count, 1)), arrays[1][order])
+    elif kind == 'bootstrap_mean':
+        return arrays[0][random.randint(0, n, (count, n))].mean(axis=1)
+    elif kind == 'bootstrap_correlation':
+        indices = random.randint(0, n, (count, n))
+        return correlations(arrays[0][indices], arrays[1][indices])
+    raise ValueError('Unknown resampling')
+
+class Analysis:
+    ''' Permutation tests and bootstrap confidence intervals spread across a process pool. '''
+
+    def __init__(self, resamples=10000, processes=None, seed=0, chunk=1000):
+        '''
+        Creates a new analysis.
+        :param number resamples: The number of permutations and bootstrap samples per test.
+        :param number processes: The number of worker processes or None for one per core.
+        :param number seed: The seed making the resamples reproducible.
+        :param number chunk: The number of resamples calculated at once by a worker.
+        '''
+        self.__resamples = resamples
+        self.__processes = processes
+        self.__seed = seed
+        self.__chunk = chunk
+
+    def __distribution(self, pool, kind, arrays):
+        '''
+        Calculates the resampled statistics in chunks across the pool.
+        :param multiprocessing.Pool pool: The pool.
+        :param str kind: The kind of resampling.
+        :param list arrays: The data.
+        :return numpy.ndarray: The resampled statistics.
+        '''
+        counts = [self.__chunk] * (self.__resamples // self.__chunk)
+        if self.__resamples % self.__chunk > 0:
+            counts.append(self.__resamples % self.__chunk)
+        tasks = [(kind, arrays, count, self.__seed * 1000003 + i) for i, count in enumerate(counts)]
+        return numpy.concatenate(pool.map(resample, tasks))
+
+    def __p(self, observed, distribution):
+        '''
+        Calculates the two-sided p-value of a permutation test.
+        :param number observed: The observed statistic.
+        :param numpy.ndarray distribution: The statistics under the null hypothesis.
+        :return number: The p-value.
+        '''
+        return (numpy.sum(numpy.abs(distribution) >= abs(observed)) + 1.0) / (len(distribution) + 1.0)
+
+    def mean(self, pool, values):
+        '''
+        Tests whether the mean of paired differences differs from zero.
+        :param multiprocessing.Pool pool: The pool.
+        :param numpy.ndarray values: The differences per subject.
+        :return dict: The observed mean, its p-value and its 95% confidence interval.
+        '''
+        values = values[~numpy.isnan(values)]
+        if len(values) < 2:
+            return {'n': int(len(values))}
+
+        bootstrap = self.__distribution(pool, 'bootstrap_mean', [values])
+        return {
+            'n': int(len(values)),
+            'mean': float(values.mean()),
+            'p': float(self.__p(values.mean(), self.__distribution(pool, 'sign', [values]))),
+            'ci': [float(numpy.percentile(bootstrap, 2.5)), float(numpy.percentile(bootstrap, 97.5))]
+        }
+
+    def correlation(self, pool, x, y):
+        '''
+        Tests whether two variables are correlated.
+        :param multiprocessing.Pool pool: The pool.
+        :param numpy.ndarray x: The first variable per subject.
+        :param numpy.ndarray y: The second variable per subject.
+        :return dict: The observed correlation, its p-value and its 95% confidence interval.
+        '''
+        valid = ~(numpy.isnan(x) | numpy.isnan(y))
+        x, y = x[valid], y[valid]
+        if len(x) < 3 or x.std() == 0 or y.std() == 0:
+            return {'n': int(len(x))}
+
+        observed = correlations(x[numpy.newaxis], y[numpy.newaxis])[0]
+        bootstrap = self.__distribution(pool, 'bootstrap_correlation', [x, y])
+        return {
+            'n': int(len(x)),
+            'r': float(observed),
+            'p': float(self.__p(observed, self.__distribution(pool, 'shuffle', [x, y]))),
+            'ci': [float(numpy.nanpercentile(bootstrap, 2.5)), float(numpy.nanpercentile(bootstrap, 97.5))]
+        }
+
+    def run(self, table):
+        '''
+        Calculates the condition effect, the block-order effect, their interaction and the correlations with the covariates.
+        :param dict table: The results per subject as returned by subject_table.
+        :return dict: The results of all tests.
+        '''
+        condition = table['primed'] - table['neutral']
+        order = table['first'] - table['second']
+        groupA = table['groupA'] == 1
+
+        pool = multiprocessing.Pool(self.__processes)
+        try:
+            report = {
+                'subjects': int(len(table['subject'])),
+                'condition': self.mean(pool, condition),
+                'order': self.mean(pool, order),
+                'condition_by_group': self.correlation(pool, condition, groupA.astype(float)),
+                'correlations': {}
+            }
+            for covariate in DSR_COVARIATES + EMOTION_COVARIATES:
+                report['correlations'][covariate] = self.correlation(pool, condition, table[covariate])
+        finally:
+            pool.close()
+            pool.join()
+        return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tests the effect of the priming on the ratings of the dilemmata.')
+    parser.add_argument('--store', default='../data/store', help='the directory of the store built by store.py')
+    parser.add_argument('--resamples', type=int, default=10000, help='the number of permutations and bootstrap samples per test')
+    parser.add_argument('--processes', type=int, help='the number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the resampling')
+    args = parser.parse_args()
+
+    report = Analysis(args.resamples, args.processes, args.seed).run(subject_table(Store(args.store)))
+    print(json.dumps(report, indent=2, sort_keys=True))
@@ -0,0 +1,261 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# Measures the presentation hot paths on a window without a subject in front of it.
+# Usage: python benchmark.py [--headless] [--baseline FILE] [--save FILE]
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy
+
+def statistics(samples):
+    '''
+    Summarizes a list of durations.
+    :param list samples: The durations in seconds.
+    :return dict: The number of samples and their minimum, median, 95th percentile, maximum and mean in milliseconds.
+    '''
+    samples = numpy.array(samples, dtype=float) * 1000
+    if samples.size == 0:
+        return {'n': 0}
+    return {
+        'n': int(samples.size),
+        'min': float(samples.min()),
+        'median': float(numpy.median(samples)),
+        'p95': float(numpy.percentile(samples, 95)),
+        'max': float(samples.max()),
+        'mean': float(samples.mean())
+    }
+
+def measure(function, repeat):
+    '''
+    Measures the latency of a function.
+    :param callable function: The function.
+    :param number repeat: The number of calls.
+    :return list: The durations in seconds.
+    '''
+    samples = []
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        function()
+        samples.append(timeit.default_timer() - start)
+    return samples
+
+class ScriptedResponses:
+    ''' Answers every rating scale automatically after a number of frames. '''
+
+    def __init__(self, frames, tick=0):
+        '''
+        Creates new scripted responses.
+        :param number frames: The number of frames a scale is drawn before it is answered.
+        :param number tick: The tick which is selected.
+        '''
+        self.__frames = frames
+        self.__tick = tick
+
+    def __enter__(self):
+        '''
+        Replaces the drawing and resetting of RatingScale.
+        '''
+        from psychopy import visual
+        from psychopy.constants import FINISHED
+
+        draw = self.__draw = visual.RatingScale.draw
+        reset = self.__reset = visual.RatingScale.reset
+        frames, tick = self.__frames, self.__tick
+
+        def scriptedDraw(scale, *args, **kwargs):
+            draw(scale, *args, **kwargs)
+            scale.scriptedFrames = getattr(scale, 'scriptedFrames', 0) + 1
+            if scale.noResponse and scale.scriptedFrames >= frames:
+                scale.setMarkerPos(tick)
+                scale.noResponse = False
+                scale.status = FINISHED
+
+        def scriptedReset(scale, *args, **kwargs):
+            reset(scale, *args, **kwargs)
+            scale.scriptedFrames = 0
+
+        visual.RatingScale.draw = scriptedDraw
+        visual.RatingScale.reset = scriptedReset
+        return self
+
+    def __exit__(self, *args):
+        '''
+        Restores the drawing and resetting of RatingScale.
+        '''
+        from psychopy import visual
+        visual.RatingScale.draw = self.__draw
+        visual.RatingScale.reset = self.__reset
+
+def synthetic_primes(file):
+    '''
+    Creates a prime list which uses the noise masks for every image, if the faces are not available.
+    :param str file: The path of the prime list.
+    :return str: The path of the list to use.
+    '''
+    from psychopy import data
+
+    basepath = os.path.dirname(os.path.abspath(file))
+    conditions = data.importConditions(file)
+    if all(os.path.isfile(os.path.join(basepath, condition[column])) for condition in conditions for column in condition):
+        return file
+
+    synthetic = tempfile.NamedTemporaryFile(mode='w', suffix='.csv', dir=basepath, delete=False)
+    with synthetic:
+        synthetic.write('forward,prime,backward,neutral\n')
+        for condition in conditions:
+            synthetic.write('{0},{1},{1},{1}\n'.format(condition['forward'], condition['backward']))
+    return synthetic.name
+
+def run(window, primes_file, dilemmata_file, repeat, frames):
+    '''
+    Runs all benchmarks.
+    :param visual.Window window: The window to draw into.
+    :param str primes_file: The prime list.
+    :param str dilemmata_file: The dilemmata.
+    :param number repeat: The number of calls per benchmark.
+    :param number frames: The number of frames until a rating scale is answered.
+    :return dict: The statistics per benchmark.
+    '''
+    from psychopy import data
+    from stimuli import PrimeHandler, PrimePool, TextureCache
+    from dilemma import DilemmaHandler, DilemmaPool
+    from helper import TextCache
+    from questionnaire import Questionnaire
+
+    results = {}
+
+    def drawing(name, function):
+        # Measure the call latency and the frame intervals during the calls.
+        window.frameIntervals = []
+        window.recordFrameIntervals = True
+        results[name] = statistics(measure(function, repeat))
+        window.recordFrameIntervals = False
+        results[name + '.frame'] = statistics(window.frameIntervals)
+
+    # Every call of a drawing benchmark consumes a trial
+    number_primes = len(data.importConditions(primes_file))
+    number_dilemmata = len(data.importConditions(dilemmata_file))
+    repeat = min(repeat, number_primes, number_dilemmata)
+
+    results['PrimeHandler.__init__'] = statistics(measure(lambda: PrimeHandler(primes_file, repeat), repeat))
+    results['DilemmaHandler.__init__'] = statistics(measure(lambda: DilemmaHandler(dilemmata_file, repeat), repeat))
+
+    # Decode every image of the list once
+    handler = PrimeHandler(primes_file, number_primes)
+    basepath = os.path.dirname(os.path.abspath(primes_file))
+    paths = sorted(set(os.path.join(basepath, trial[column]) for trial in handler.trialList for column in trial))
+    cache = TextureCache()
+    results['TextureCache.get.cold'] = statistics([measure(lambda: cache.get(path), 1)[0] for path in paths])
+    results['TextureCache.get.warm'] = statistics([measure(lambda: cache.get(path), 1)[0] for path in paths])
+
+    with ScriptedResponses(frames):
+        for pooled in [False, True]:
+            suffix = '.pooled' if pooled else ''
+            primes = iter(PrimeHandler(primes_file, repeat, cache=cache))
+            prime_pool = PrimePool(window) if pooled else None
+            drawing('Prime.show' + suffix, lambda: show_prime(primes, window, prime_pool))
+
+            dilemmata = iter(DilemmaHandler(dilemmata_file, repeat))
+            dilemma_pool = DilemmaPool(window) if pooled else None
+            drawing('Dilemma.show' + suffix, lambda: show_dilemma(dilemmata, window, dilemma_pool))
+
+        # A page of four items like the questionnaires of a session, whose layout is kept between the calls
+        texts = TextCache(window)
+        items = [{'name': name, 'title': name.upper(), 'low': 'Low', 'high': 'High', 'choices': 10} for name in 'abcd']
+        for name, cache_texts in [('Questionnaire.show', None), ('Questionnaire.show.cached', texts)]:
+            questionnaire = Questionnaire('Benchmark', items, ['Before', 'After'])
+            drawing(name, lambda: questionnaire.show(window, cache_texts))
+
+    return results
+
+def show_prime(primes, window, pool):
+    '''
+    Shows the next prime of a handler.
+    :param PrimeHandler primes: The running handler.
+    :param visual.Window window: The window to draw into.
+    :param PrimePool pool: The pool or None.
+    :return: The scripted rating.
+    '''
+    next(primes)
+    return primes.currentPrime().show(window, 1, 1, 1, pool)
+
+def show_dilemma(dilemmata, window, pool):
+    '''
+    Shows the next dilemma of a handler.
+    :param DilemmaHandler dilemmata: The running handler.
+    :param visual.Window window: The window to draw into.
+    :param DilemmaPool pool: The pool or None.
+    :return: The scripted rating.
+    '''
+    next(dilemmata)
+    return dilemmata.currentDilemma().show(window, pool)
+
+def compare(results, baseline, tolerance):
+    '''
+    Compares the medians of the results with a baseline.
+    :param dict results: The current statistics.
+    :param dict baseline: The stored statistics.
+    :param number tolerance: The accepted relative slowdown.
+    :return list: The names of the regressed benchmarks.
+    '''
+    regressions = []
+    for name in sorted(results):
+        if name in baseline and results[name].get('n') and baseline[name].get('n'):
+            if results[name]['median'] > baseline[name]['median'] * (1 + tolerance):
+                regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the presentation hot paths.')
+    parser.add_argument('--headless', action='store_true', help='render into an offscreen context without a display')
+    parser.add_argument('--primes', default='../stimuli/primes.csv', help='the prime list')
+    parser.add_argument('--dilemmata', default='../stimuli/dilemmata0.csv', help='the dilemmata')
+    parser.add_argument('--repeat', type=int, default=10, help='the number of calls per benchmark')
+    parser.add_argument('--frames', type=int, default=5, help='the number of frames until a rating scale is answered')
+    parser.add_argument('--baseline', help='a stored result to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='the accepted relative slowdown of the median')
+    parser.add_argument('--save', help='store the result as new baseline')
+    args = parser.parse_args()
+
+    # The offscreen context must be requested before any window is created
+    if args.headless:
+        import pyglet
+        pyglet.options['headless'] = True
+        pyglet.options['shadow_window'] = False
+
+    from psychopy import visual
+    window = visual.Window(size=(1280, 720), fullscr=False, allowGUI=False, waitBlanking=not args.headless, units='norm')
+
+    primes_file = synthetic_primes(args.primes)
+    try:
+        results = run(window, primes_file, args.dilemmata, args.repeat, args.frames)
+    finally:
+        window.close()
+        if primes_file != args.primes:
+            os.remove(primes_file)
+
+    for name in sorted(results):
+        stats = results[name]
+        if stats['n'] > 0:
+            print('{:<28} n={:<4} median={:8.3f}ms p95={:8.3f}ms max={:8.3f}ms'.format(name, stats['n'], stats['median'], stats['p95'], stats['max']))
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for name in regressions:
+            print('Regression: {}'.format(name))
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# Qualifies the display of a lab station and writes a report per station.
+# Usage: python calibration.py [--flips N] [--sequences N] [--output DIR]
+
+from benchmark import statistics
+
+import argparse
+import csv
+import glob
+import json
+import os
+import socket
+import time
+import timeit
+
+import numpy
+
+# The highest accepted standard deviation of the frame intervals relative to the frame period
+JITTER_TOLERANCE = 0.1
+
+def face_sizes(primes_file):
+    '''
+    Reads the sizes of the images of a prime list without decoding them.
+    :param str primes_file: The path of the prime list.
+    :return list: The distinct sizes of the existing images.
+    '''
+    from PIL import Image
+
+    basepath = os.path.dirname(os.path.abspath(primes_file))
+    with open(primes_file) as file:
+        paths = sorted(set(os.path.join(basepath, row[column]) for row in csv.DictReader(file) for column in ['forward', 'prime', 'backward', 'neutral']))
+    return sorted(set(Image.open(path).size for path in paths if os.path.isfile(path)))
+
+def longest_dilemma(files):
+    '''
+    Finds the longest dilemma.
+    :param list files: The paths of the dilemmata.
+    :return str: The longest text.
+    '''
+    from psychopy import data
+    return max((trial['dilemma'] for file in files for trial in data.importConditions(file)), key=len)
+
+def finish(function):
+    '''
+    Measures a drawing call including the work of the graphics card.
+    :param callable function: The call.
+    :return number: The duration in seconds.
+    '''
+    from pyglet import gl
+
+    start = timeit.default_timer()
+    function()
+    gl.glFinish()
+    return timeit.default_timer() - start
+
+def calibrate(window, primes_file, dilemmata_files, flips, sequences):
+    '''
+    Measures the timing of a window.
+    :param visual.Window window: The full screen window of the station.
+    :param str primes_file: The prime list, whose image sizes are uploaded.
+    :param list dilemmata_files: The dilemmata, whose longest text is built.
+    :param number flips: The number of flips measuring the refresh interval.
+    :param number sequences: The number of masked 1-frame sequences.
+    :return dict: The report.
+    '''
+    from psychopy import visual
+    from stimuli import Prime
+    from dilemma import TEXT_POS, TEXT_HEIGHT
+    from helper import TextCache
+    from masks import NoiseMasks
+
+    report = {'station': socket.gethostname(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'size': list(window.size)}
+    rate = window.getActualFrameRate(nIdentical=20, nMaxFrames=240, nWarmUpFrames=20)
+    report['refresh_rate'] = rate
+    period = 1.0 / rate if rate else window.monitorFramePeriod
+
+    # The intervals between consecutive flips of an empty screen
+    timestamps = []
+    for _ in range(flips):
+        timestamps.append(window.flip())
+    intervals = numpy.diff(timestamps)
+    report['intervals'] = statistics(intervals)
+    report['intervals']['std'] = float(intervals.std() * 1000)
+    report['intervals']['variance'] = float(intervals.var() * 1000 * 1000)
+    report['intervals']['late'] = int(numpy.sum(intervals > 1.5 * period))
+
+    # Uploading a new image into a texture, as done when the images of a prime are swapped
+    stimulus = visual.ImageStim(window, numpy.zeros((4, 4)))
+
+    def upload(image):
+        stimulus.image = image
+        stimulus.draw()
+
+    report['upload'] = {}
+    for size in face_sizes(primes_file) or [(562, 762)]:
+        images = [NoiseMasks.generate(seed, size, 128, 40) for seed in range(10)]
+        report['upload']['{}x{}'.format(*size)] = statistics([finish(lambda: upload(image)) for image in images])
+        window.clearBuffer()
+
+    # Building the longest dilemma directly and as a cached bitmap
+    text = longest_dilemma(dilemmata_files)
+    report['text'] = {
+        'length': len(text),
+        'TextStim': statistics([finish(lambda: visual.TextStim(window, text, pos=TEXT_POS, height=TEXT_HEIGHT).draw()) for _ in range(5)]),
+        'TextCache': statistics([finish(lambda: TextCache(window).get(text, TEXT_POS, TEXT_HEIGHT)) for _ in range(5)])
+    }
+    window.clearBuffer()
+
+    # Masked sequences with one frame per phase, measured like a session
+    stimuli = [visual.ImageStim(window, NoiseMasks.generate(i, (562, 762), 128, 40)) for i in range(3)]
+    dropped = []
+    for _ in range(sequences):
+        phases = []
+        for name, image in zip(['forward', 'prime', 'backward'], stimuli):
+            image.draw()
+            phases.append((name, 1, [window.flip()]))
+        dropped.append(Prime.measure(phases, window.flip(), period)['dropped'])
+    report['sequences'] = {'n': sequences, 'dropped': int(sum(dropped)), 'failed': int(sum(1 for value in dropped if value > 0))}
+
+    report['one_frame_primes'] = bool(rate) and report['sequences']['failed'] == 0 and report['intervals']['late'] == 0 and intervals.std() < JITTER_TOLERANCE * period
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measures the display timing of the station and writes a report.')
+    parser.add_argument('--primes', default='../stimuli/primes.csv', help='the prime list')
+    parser.add_argument('--dilemmata', nargs='+', default=sorted(glob.glob('../stimuli/dilemmata*.csv')), help='the dilemmata')
+    parser.add_argument('--flips', type=int, default=600, help='the number of flips measuring the refresh interval')
+    parser.add_argument('--sequences', type=int, default=100, help='the number of masked 1-frame sequences')
+    parser.add_argument('--output', default='../data/calibration', help='the directory of the reports')
+    args = parser.parse_args()
+
+    from psychopy import visual
+    window = visual.Window(fullscr=True, monitor='testMonitor', allowGUI=False, units='norm')
+    try:
+        report = calibrate(window, args.primes, args.dilemmata, args.flips, args.sequences)
+    finally:
+        window.close()
+
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    path = os.path.join(args.output, '{}.json'.format(report['station']))
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+    print('Refresh rate: {} Hz, interval std: {:.3f} ms, late flips: {}'.format(report['refresh_rate'], report['intervals']['std'], report['intervals']['late']))
+    print('Masked sequences with dropped frames: {} of {}'.format(report['sequences']['failed'], report['sequences']['n']))
+    print('1-frame primes are {}achievable on this station ({})'.format('' if report['one_frame_primes'] else 'NOT ', path))
@@ -0,0 +1,247 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# Hands out subject ids with counterbalanced groups to several stations and collects their data files.
+# Usage: python coordinator.py [--port PORT] [--directory DIR]
+
+from subject import Subject
+
+import argparse
+import json
+import os
+import random
+import socket
+import threading
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib2 import Request, urlopen
+    from urllib import quote
+    from urlparse import parse_qs, urlparse
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.request import Request, urlopen
+    from urllib.parse import parse_qs, quote, urlparse
+
+GROUPS = ['A', 'B']
+
+def write_json(path, content):
+    '''
+    Replaces a JSON file atomically.
+    :param str path: The path of the file.
+    :param content: The content.
+    '''
+    with open(path + '.tmp', 'w') as file:
+        json.dump(content, file, indent=2, sort_keys=True)
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(path + '.tmp', path)
+
+def read_json(path, default):
+    '''
+    Loads a JSON file.
+    :param str path: The path of the file.
+    :param default: The content if the file does not exist.
+    :return: The content.
+    '''
+    if not os.path.isfile(path):
+        return default
+    with open(path) as file:
+        return json.load(file)
+
+class Coordinator:
+    ''' The allocation of subjects to groups, balanced in permuted blocks. '''
+
+    def __init__(self, directory):
+        '''
+        Creates or loads a coordinator.
+        :param str directory: The directory which keeps the state and the collected data files.
+        '''
+        self.__directory = directory
+        self.__path = os.path.join(directory, 'allocations.json')
+        self.__lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.__state = read_json(self.__path, {'subjects': [], 'block': []})
+
+    def allocate(self, station):
+        '''
+        Allocates a new subject.
+        :param str station: The name of the requesting station.
+        :return dict: The id, the group and the slot of the subject in a precompiled schedule.
+        '''
+        with self.__lock:
+            # Draw the groups from shuffled blocks containing each group once
+            if len(self.__state['block']) == 0:
+                self.__state['block'] = random.sample(GROUPS, len(GROUPS))
+
+            # The slots are numbered in the order of the allocations, so no two stations share a schedule
+            subject = {'id': Subject.generate_id(), 'group': self.__state['block'].pop(), 'station': station, 'slot': len(self.__state['subjects'])}
+            self.__state['subjects'].append(subject)
+            write_json(self.__path, self.__state)
+            return subject
+
+    def counts(self):
+        '''
+        Returns the number of subjects per group.
+        :return dict: The number of subjects per group.
+        '''
+        with self.__lock:
+            return dict((group, sum(1 for subject in self.__state['subjects'] if subject['group'] == group)) for group in GROUPS)
+
+    def store(self, name, content):
+        '''
+        Stores a collected data file.
+        :param str name: The name of the file.
+        :param bytes content: The content of the file.
+        :raises ValueError: If the name is invalid.
+        '''
+        name = os.path.basename(name)
+        if name in ['', '.', '..', 'allocations.json']:
+            raise ValueError('Invalid file name')
+        with open(os.path.join(self.__directory, name), 'wb') as file:
+            file.write(content)
+
+class CoordinatorRequestHandler(BaseHTTPRequestHandler):
+    ''' The HTTP interface of a coordinator. '''
+
+    def do_GET(self):
+        '''
+        Answers "/status" with the number of subjects per group.
+        '''
+        if urlparse(self.path).path == '/status':
+            self.__reply(200, self.server.coordinator.counts())
+        else:
+            self.__reply(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        '''
+        Answers "/allocate?station=NAME" with a new subject and stores files sent to "/upload?name=NAME".
+        '''
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        content = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if url.path == '/allocate':
+            self.__reply(200, self.server.coordinator.allocate(query.get('station', ['unknown'])[0]))
+        elif url.path == '/upload' and 'name' in query:
+            try:
+                self.server.coordinator.store(query['name'][0], content)
+                self.__reply(200, {'stored': query['name'][0]})
+            except ValueError as error:
+                self.__reply(400, {'error': str(error)})
+        else:
+            self.__reply(404, {'error': 'Not found'})
+
+    def __reply(self, status, content):
+        '''
+        Sends a JSON reply.
+        :param number status: The HTTP status code.
+        :param dict content: The content.
+        '''
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class CoordinatorServer(ThreadingMixIn, HTTPServer):
+    ''' A HTTP server serving a coordinator. '''
+
+    daemon_threads = True
+
+    def __init__(self, address, coordinator):
+        '''
+        Creates a new server.
+        :param tuple address: The host and port to listen on.
+        :param Coordinator coordinator: The coordinator to serve.
+        '''
+        HTTPServer.__init__(self, address, CoordinatorRequestHandler)
+        self.coordinator = coordinator
+
+class CoordinatorClient:
+    ''' A station of a coordinator, which keeps reserved allocations and pending uploads in a local cache. '''
+
+    def __init__(self, url, cache, reserve=2, timeout=3):
+        '''
+        Creates a new client.
+        :param str url: The URL of the coordinator, e.g. "http://192.168.0.2:8000".
+        :param str cache: The path of the local cache file.
+        :param number reserve: The number of allocations kept for the case that the coordinator is down.
+        :param number timeout: The timeout of requests in seconds.
+        '''
+        self.__url = url.rstrip('/')
+        self.__path = cache
+        self.__reserve = reserve
+        self.__timeout = timeout
+        self.__cache = read_json(cache, {'reserved': [], 'pending': []})
+
+    def allocate(self):
+        '''
+        Allocates a new subject from the coordinator or, if it is down, from the reserved allocations.
+        The allocation stays reserved until it is confirmed, so a session which is not started does not use it up.
+        :return dict: The id and the group of the subject or None, if neither is available.
+        '''
+        subject = None
+        try:
+            # Keep enough allocations in reserve for the next sessions
+            while len(self.__cache['reserved']) < self.__reserve + 1:
+                self.__cache['reserved'].append(self.__request('/allocate?station=' + quote(socket.gethostname())))
+        except (IOError, ValueError):
+            pass
+
+        if len(self.__cache['reserved']) > 0:
+            subject = self.__cache['reserved'][0]
+        write_json(self.__path, self.__cache)
+        return subject
+
+    def confirm(self, allocation):
+        '''
+        Removes an allocation from the reserve as its subject takes part.
+        :param dict allocation: The allocation returned by CoordinatorClient.allocate.
+        '''
+        if allocation in self.__cache['reserved']:
+            self.__cache['reserved'].remove(allocation)
+            write_json(self.__path, self.__cache)
+
+    def upload(self, path):
+        '''
+        Sends a data file to the coordinator or keeps it pending, if it is down.
+        :param str path: The path of the data file.
+        :return bool: True, if all pending files were sent.
+        '''
+        if path not in self.__cache['pending']:
+            self.__cache['pending'].append(path)
+
+        for pending in list(self.__cache['pending']):
+            try:
+                with open(pending, 'rb') as file:
+                    self.__request('/upload?name=' + quote(os.path.basename(pending)), file.read())
+                self.__cache['pending'].remove(pending)
+            except (IOError, ValueError):
+                break
+
+        write_json(self.__path, self.__cache)
+        return len(self.__cache['pending']) == 0
+
+    def __request(self, path, content=b''):
+        '''
+        Sends a POST request to the coordinator.
+        :param str path: The path and query of the request.
+        :param bytes content: The body of the request.
+        :return dict: The decoded reply.
+        :raises IOError: If the coordinator is not reachable.
+        '''
+        reply = urlopen(Request(self.__url + path, data=content), timeout=self.__timeout)
+        return json.loads(reply.read().decode('utf-8'))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Coordinates the subjects of several stations.')
+    parser.add_argument('--port', type=int, default=8000, help='the port to listen on')
+    parser.add_argument('--directory', default='../data/central', help='the directory of the allocations and the collected data files')
+    args = parser.parse_args()
+
+    CoordinatorServer(('', args.port), Coordinator(args.directory)).serve_forever()
@@ -6,18 +6,29 @@ import os
 
 from psychopy import visual, data
 
+from responses import frame_latencies
+from tracing import tracer, traced
+
+# The layout of the text of a dilemma
+TEXT_POS = (0, 0.2)
+TEXT_HEIGHT = 0.06
 
 class DilemmaHandler(data.TrialHandler):
     ''' A handler for multiple dilemmata. '''
 
-    def __init__(self, file, dilemmata):
+    @traced('DilemmaHandler.__init__')
+    def __init__(self, file, dilemmata, trials=None):
         '''
         Creates a new DilemmaHandler.
         :param str file: The path of the config file.
         :param number dilemmata: The number of dilemmata which is to be shown.
+        :param list trials: The rows of a precompiled schedule, which are shown in order instead of sampling the config file.
         :raises ValueError: If the path is not valid file.
         '''
-        dilemmata = random.sample(data.importConditions(file), dilemmata)
+        if trials is None:
+            dilemmata = random.sample(data.importConditions(file), dilemmata)
+        else:
+            dilemmata = trials[:dilemmata]
 
         # Check if the loaded data matches the format.
         if len(dilemmata[0]) == 1 and 'dilemma' in dilemmata[0]:
@@ -32,15 +43,54 @@ class DilemmaHandler(data.TrialHandler):
         '''
         return Dilemma(self.thisTrial['dilemma'])
 
-    def addResult(self, experiment, rating):
+    def addResult(self, experiment, rating, timing=None):
         '''
         Adds the result of a trial.
         :param ExperimentHandler experiment: The running experiment.
         :param number rating: The result of the trail.
+        :param dict timing: The response latencies of the dilemma.
         '''
         self.addData('rating', rating)
+        if timing is not None:
+            for name in sorted(timing):
+                self.addData(name, timing[name])
         experiment.nextEntry()
 
+    def prefetch(self, textCache, number):
+        '''
+        Renders the texts of the current and the following dilemmata ahead of time.
+        :param TextCache textCache: The cache for the rendered texts.
+        :param number number: The number of dilemmata.
+        '''
+        start = max(self.thisN, 0)
+        textCache.prerender([(trial['dilemma'], TEXT_POS, TEXT_HEIGHT) for trial in self.trialList[start:start + number]])
+
+
+class DilemmaPool:
+    ''' Persistent stimuli of a window which are reused by all dilemmata. '''
+
+    def __init__(self, win):
+        '''
+        Creates the text and the rating scale once.
+        :param visual.Window win: The window in which the dilemmata should be drawn.
+        '''
+        self.__text = visual.TextStim(win, '', pos=TEXT_POS, height=TEXT_HEIGHT)
+        self.__rating = Dilemma.rating(win)
+
+    def text(self):
+        '''
+        Returns the text stimulus.
+        :return visual.TextStim: The text stimulus.
+        '''
+        return self.__text
+
+    def rating(self):
+        '''
+        Returns the rating scale.
+        :return: The rating scale.
+        '''
+        return self.__rating
+
 
 class Dilemma:
     ''' A dilemma. '''
@@ -51,6 +101,7 @@ class Dilemma:
         :param str text: The text of the dilemma.
         '''
         self.__text = text
+        self.__timing = None
 
     def text(self):
         '''
@@ -59,13 +110,14 @@ class Dilemma:
         '''
         return self.__text
 
-    def show(self, win):
+    @staticmethod
+    def rating(win):
         '''
-        Shows a dilemma.
-        :param visual.Window win: The text of the dilemma.
+        Returns the rating scale for the acceptance of a dilemma.
+        :param visual.Window win: The window in which the rating should be drawn.
+        :return: The rating scale.
         '''
-        text = visual.TextStim(win, self.__text, pos=(0, 0.2), height=0.06)
-        rating = visual.RatingScale(
+        return visual.RatingScale(
             win,
             low=0,
             high=9,
@@ -80,8 +132,49 @@ class Dilemma:
             acceptText='Bewertung abgeben'
             )
 
-        while rating.noResponse:
-            text.draw()
-            rating.draw()
-            win.flip()
+    def show(self, win, pool=None, textCache=None, responses=None):
+        '''
+        Shows a dilemma.
+        :param visual.Window win: The text of the dilemma.
+        :param DilemmaPool pool: Persistent stimuli of the window which are reused instead of created.
+        :param TextCache textCache: An optional cache holding the pre-rendered text.
+        :param ResponseMonitor responses: An optional monitor timestamping the presses at the input device.
+        '''
+        if textCache is not None:
+            text = textCache.get(self.__text, TEXT_POS, TEXT_HEIGHT)
+        elif pool is not None:
+            text = pool.text()
+            text.text = self.__text
+        else:
+            text = visual.TextStim(win, self.__text, pos=TEXT_POS, height=TEXT_HEIGHT)
+
+        if pool is None:
+            rating = Dilemma.rating(win)
+        else:
+            rating = pool.rating()
+            rating.reset()
+
+        if responses is not None:
+            responses.start()
+
+        # The response latencies are relative to the first flip showing the dilemma
+        onset = first = None
+        with tracer.span('rating', 'wait'):
+            while rating.noResponse:
+                text.draw()
+                rating.draw()
+                response = win.flip()
+                if onset is None:
+                    onset = response
+                if first is None and rating.getRating() is not None:
+                    first = response
+
+        self.__timing = responses.latencies(onset, first, response) if responses is not None else frame_latencies(onset, first, response)
         return rating.getRating()
+
+    def timing(self):
+        '''
+        Returns the response latencies of the last presentation.
+        :return dict: The latencies or None, if the dilemma was not shown yet.
+        '''
+        return self.__timing
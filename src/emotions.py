@@ -1,14 +1,16 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-from psychopy import visual
-from helper import showRatings
+from questionnaire import Questionnaire
 
 import numbers
+import os
 
 class Emotions:
     ''' A four-dimensional emotional collection of a subject. '''
 
+    _questionnaire = None
+
     def __init__(self, happiness, anger, sadness, disgust):
         '''
         Creates a new emotion collection.
@@ -65,17 +67,15 @@ class Emotions:
         exp.nextEntry()
 
     @staticmethod
-    def from_window(window):
+    def from_window(window, textCache=None):
         '''
         Loads the collection from a questionaire showed in a window.
         :param visual.Window window: The window in which the questionaire should be drawn.
+        :param TextCache textCache: An optional cache for the pre-rendered titles.
         :return Emotions: The collection.
         '''
-        results = showRatings(window, "Bitte bewerte Deine aktuelle Stimmung:", [
-            ['happiness', [u'Gar nicht fröhlich', u'Sehr fröhlich'], u'Fröhlichkeit', 10],
-            ['anger', [u'Gar nicht wütend', u'Sehr wütend'], 'Wut', 10],
-            ['sadness', [u'Gar nicht traurig', 'Sehr traurig'], 'Traurigkeit', 10],
-            ['disgust', [u'Gar nicht angewidert', 'Sehr angewidert'], 'Ekel', 10]
-        ], ["Bitte bewerte Deine Stimmung.", "Bewertung abgeben"], True)
+        if Emotions._questionnaire is None:
+            Emotions._questionnaire = Questionnaire.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'stimuli', 'emotions.csv'), "Bitte bewerte Deine aktuelle Stimmung:", ["Bitte bewerte Deine Stimmung.", "Bewertung abgeben"], True)
 
+        results = Emotions._questionnaire.show(window, textCache)
         return Emotions(results['happiness'], results['anger'], results['sadness'], results['disgust'])
@@ -3,59 +3,54 @@
 
 from psychopy import visual
 
-import random
-
-def showRatings(window, title, ratings, buttonText, randomOrder=False):
-    '''
-    Present up to 4 rating scales.
-    :param visual.Window window: The window to draw into.
-    :param str title: The overall title.
-    :param list ratings: [[name, [scale], title, numberSelection], ...]
-    :param list buttonText: [buttonBefore, buttonAfter].
-    :param bool randomOrder: Check if the order should be randomized.
-    :return map: A map with the corresponding names and values.
-    '''
-
-    if len(buttonText) is not 2:
-        raise ValueError('Invalid button texts')
-    elif len(ratings) > 4:
-        raise ValueError('Too much scales')
-
-    # Shuffles the order if required
-    if randomOrder:
-        random.shuffle(ratings)
-
-    # Create the overall title
-    text = visual.TextStim(window, title, pos=(0, 0.75), height=0.075)
-
-    # Create the rating scales
-    ratingScales = []
-    yPos = 0.45
-    for i, scale in enumerate(ratings):
-        ratingScale = visual.RatingScale(window, textSize=0.8, stretch=1.5, size=0.9, low=0, high=ratings[i][3] - 1, acceptKeys=['space'], labels=ratings[i][1], scale=ratings[i][2], showAccept=(True if i == len(ratings) - 1 else False), pos=(0, yPos), acceptPreText=buttonText[0], acceptSize=2.8, showValue=False, acceptText=buttonText[1])
-        ratingScales.append(ratingScale)
-        yPos -= 0.35
-
-    # Draw the scales
-    while True:
-        text.draw()
-
-        # Check if all scales but the last are filled
-        shouldEnd = True
-        for ratingScale in ratingScales[:(len(ratingScales) - 1)]:
-            ratingScale.draw()
-            if shouldEnd is True and ratingScale.getRating() is None:
-                shouldEnd = False
-
-        # Exit if the last scales is filled, too
-        if shouldEnd is True and not ratingScales[len(ratingScales) - 1].noResponse:
-            break
-
-        ratingScales[len(ratingScales) - 1].draw()
-        window.flip()
-
-    # Creates the result
-    result = {}
-    for i, scale in enumerate(ratingScales):
-        result[ratings[i][0]] = scale.getRating()
-    return result
+class TextCache:
+    ''' A cache of texts which are rendered only once into reusable bitmaps. '''
+
+    def __init__(self, window):
+        '''
+        Creates a new TextCache.
+        :param visual.Window window: The window the texts are drawn into.
+        '''
+        self.__window = window
+        self.__bitmaps = {}
+
+    def get(self, text, pos, height):
+        '''
+        Returns the bitmap of a text, rendering it on the first request.
+        Must not be called while a frame is partially drawn, as the back buffer is used for rendering.
+        :param str text: The text.
+        :param tuple pos: The position of the text.
+        :param number height: The height of the text.
+        :return visual.BufferImageStim: The drawable bitmap.
+        '''
+        key = (text, tuple(pos), height)
+        bitmap = self.__bitmaps.get(key)
+        if bitmap is None:
+            stimulus = visual.TextStim(self.__window, text, pos=pos, height=height)
+            bitmap = visual.BufferImageStim(self.__window, stim=[stimulus], rect=self.__rect(stimulus, pos))
+            self.__window.clearBuffer()
+            self.__bitmaps[key] = bitmap
+        return bitmap
+
+    def prerender(self, texts):
+        '''
+        Renders texts ahead of time.
+        :param list texts: [[text, pos, height], ...]
+        '''
+        for text, pos, height in texts:
+            self.get(text, pos, height)
+
+    def __rect(self, stimulus, pos):
+        '''
+        Calculates the area of the window covered by a text.
+        :param visual.TextStim stimulus: The text.
+        :param tuple pos: The position of the text.
+        :return list: [left, top, right, bottom] in normalized units.
+        '''
+        # Older versions of PsychoPy do not report the size of a text
+        if not hasattr(stimulus, 'boundingBox'):
+            return [-1, 1, 1, -1]
+
+        width = float(stimulus.boundingBox[0]) / self.__window.size[0] + 0.01
+        height = float(stimulus.boundingBox[1]) / self.__window.size[1] + 0.01
+        return [max(-1, pos[0] - width), min(1, pos[1] + height), min(1, pos[0] + width), max(-1, pos[1] - height)]
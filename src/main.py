@@ -1,94 +1,106 @@
 #!/usr/bin/env python2
 # -*- coding: utf-8 -*-
 
-from psychopy import core, visual, event, data
-from psychopy.constants import PLAYING
+from psychopy import core, logging
 
-from stimuli import PrimeHandler
-from dilemma import DilemmaHandler
+from startup import Background, StartupTimer, import_modules
 from subject import Subject
+from coordinator import CoordinatorClient
+from schedule import Schedule
+from tracing import tracer
+
+import argparse
+import atexit
+import random
+
+parser = argparse.ArgumentParser(description='Runs a session of the experiment.')
+parser.add_argument('--coordinator', metavar='URL', help='allocate the subject from and send the data to a coordinator')
+parser.add_argument('--schedule', metavar='FILE', help='take the trials from a schedule compiled by schedule.py')
+parser.add_argument('--buffered-movie', action='store_true', help='play the depriming movie from a decode-ahead buffer without sound')
+args = parser.parse_args()
+
+# Generate the id and warm up the modules which need no OpenGL context in the background
+tracer.enable()
+timer = StartupTimer()
+ids = Background(Subject.generate_id)
+imports = Background(import_modules, ['numpy', 'PIL.Image', 'psychopy.data'])
+
+# Allocate id and group from the coordinator, if one is used and reachable or allocations are reserved
+client = CoordinatorClient(args.coordinator, '../data/coordinator.json') if args.coordinator else None
+allocation = client.allocate() if client is not None else None
+
+# Load the subject from the dialog. Only importing its toolkit overlaps with the generation of the id, as the dialog shows the id.
+from psychopy import gui
+if allocation is not None:
+    subject = Subject.from_dialog(allocation['id'], allocation['group'])
+else:
+    subject = Subject.from_dialog(ids.result())
+timer.mark('dialog')
+if not subject: core.quit()
+
+# A cancelled dialog or a rejected subject keeps the allocation for the next session, so the groups stay balanced
+if allocation is not None:
+    client.confirm(allocation)
+
+# Look up the precompiled schedule of the subject in the slot allocated by the coordinator or in the first free one
+schedule = Schedule(args.schedule).claim(subject.id(), allocation.get('slot') if allocation is not None else None) if args.schedule else None
+info = subject.to_dictionary()
+if schedule is not None:
+    info.update({'schedule': schedule['slot'], 'scheduleSeed': schedule['seed']})
+
+# The masks of every trial can be regenerated from the recorded seed
+info['maskSeed'] = (schedule['seed'] * 1000003 + schedule['slot']) % 2 ** 31 if schedule is not None else random.randint(0, 2 ** 31 - 1)
+
+# The visual stack is imported on the main thread as it creates OpenGL resources
+imports.result()
+from psychopy import visual, monitors
+
+from stimuli import FACE_COLUMNS, PrimeHandler, PrimePool, StimulusCatalog, StimulusPack, TextureCache, TextureLevels
+from dilemma import DilemmaPool
 from emotions import Emotions
 from dsr import DSR
+from helper import TextCache
+from stream import StreamingExperimentHandler
+from responses import ResponseMonitor
+from masks import NoiseMasks
+from session import show_dilemmata, show_movie, show_complex_shape, show_text
+timer.mark('imports')
 
-from itertools import islice
-
-def show_dilemmata(experiment, window, dilemmata, number_dilemmata, number_primes, forward, prime, prime_name, backward):
-    '''
-    Shows a number of possible primed dilemmata.
-    :param data.ExperimentHandler experiment: The current experiment
-    :param visual.Window window: The window to draw into.
-    :param number dilemmata: The file from which the dilemmata should be loaded.
-    :param str number_dilemmata: The number of dilemmata which are to be shown.
-    :param number number_primes: The number of primes per dilemma which are to be shown.
-    :param number forward: The number of frames the forward mask will be presented.
-    :param number prime: The number of frames the priem will be presented.
-    :param str prime_name: The name of the column with the prime.
-    :param number backward: The number of frames the backward mask will be presented.
-    '''
-    dilemmata = DilemmaHandler(dilemmata, number_dilemmata)
-    primes = PrimeHandler('../stimuli/primes.csv', number_dilemmata * number_primes, prime_name)
-
-    experiment.addLoop(dilemmata)
-    experiment.addLoop(primes)
-
-    # Iterate through dilemmata.
-    for _ in dilemmata:
-        # Show the primes
-        for _ in islice(primes, number_primes):
-            result = primes.currentPrime().show(window, forward, prime, backward)
-            primes.addResult(experiment, result)
-
-        dilemma = dilemmata.currentDilemma()
-        dilemmata.addResult(experiment, dilemma.show(window))
-
-def show_movie(win):
-    '''
-    Presents a movie for the de-priming.
-    :param visual.Window win: The window to draw into.
-    '''
-    text = visual.TextStim(win, "Eine kleine Pause...", pos=(0, 0.8))
-    mov = visual.MovieStim2(win, '../stimuli/pause.mp4', size=(640, 480), pos=(0, -0.2))
-    mov.play()
-    while mov.status == PLAYING:
-        text.draw()
-        mov.draw()
-        win.flip()
-
-def show_complex_shape(win):
-    '''
-    Presents a complex shape for the de-priming until space is pressed or 90 seconds are gone.
-    :param visual.Window win: The window to draw into.
-    '''
-    introduction = visual.TextStim(win, u"Bitte zeichne diese komplexe Form innerhalb von 90 Sekunden ab und drücke danach die Leertaste um fortzufahren:", pos=(0, 0.7), height=0.08)
-    shape = visual.ImageStim(win, "../stimuli/complex_shape.png", pos=(0, -0.2))
-    shape.size *= 2.5
-
-    introduction.draw()
-    shape.draw()
-    win.flip()
-
-    event.waitKeys(maxWait=90, keyList=['space'])
-
-def show_text(win, text, frontHeight):
-    '''
-    Present the introduction screen until 'space' is pressed.
-    :param visual.Window win: The window to draw into.
-    :param visual.Window text: The text of the welcome screen.
-    '''
-    visual.TextStim(win, text, height=frontHeight).draw()
-    win.flip()
-    event.waitKeys(keyList=['space'])
-
-# Load the subject from the dialog
-subject = Subject.from_dialog()
-if not subject: core.quit()
+# Validate all faces once, so a missing or broken stimulus stops the session before it starts. The masks are generated.
+catalog = StimulusCatalog('../stimuli/primes.csv', columns=FACE_COLUMNS)
+timer.mark('catalog')
 
 fileName = '../data/{}'.format(str(subject))
-exp = data.ExperimentHandler(name='PrimingMeetsDilemma', version='0.1', extraInfo=subject.to_dictionary(), originPath='../data/', savePickle=False, saveWideText=True, dataFileName=fileName)
+exp = StreamingExperimentHandler(name='PrimingMeetsDilemma', version='0.1', extraInfo=info, originPath='../data/', savePickle=False, saveWideText=True, dataFileName=fileName)
+timer.mark('experiment')
+
+# The timeline of the session is written even if it crashes
+atexit.register(tracer.save, fileName + '.trace.json')
+
+# Decode the images while the window is created and its timing is checked. They are downsampled once to the texture level matching their drawn size on this display.
+levels = TextureLevels(monitors.Monitor('testMonitor').getSizePix())
+textures = TextureCache(pack=StimulusPack.find('../stimuli/primes.csv'), levels=levels)
+masks = NoiseMasks(info['maskSeed'], textures)
+if schedule is not None:
+    preloading = Background(textures.preload, PrimeHandler.paths('../stimuli/primes.csv', [row for block in schedule['blocks'] for row in block['primes'] + block['reserve']], FACE_COLUMNS))
+else:
+    preloading = Background(textures.preload, catalog.paths())
 win = visual.Window(fullscr=True, monitor='testMonitor', checkTiming=True)
+pools = (PrimePool(win), DilemmaPool(win))
+texts = TextCache(win)
+timer.mark('window')
+
+# Timestamp the presses of the ratings at the input device
+responses = ResponseMonitor()
+timer.mark('responses')
+
+# The phases are traced as well, the breakdown is kept in the log and the data file
+logging.info('Start-up:\n{}'.format(timer))
+timer.save(exp)
 
 # Show welcome screen
-show_text(win, u"""Herzlich willkommen!
+with tracer.span('welcome', 'phase'):
+    show_text(win, u"""Herzlich willkommen!
 Im Folgenden wirst Du verschiedene Gesichter sehen. Wir bitten Dich, diese nach ihrer Sympathie zu bewerten.
 
 Anschließend werden Dir moralische Dilemmata präsentiert. Deine Aufgabe besteht darin, den Ausgang des Dilemmas zwischen absoluter Ablehnung und vollkommender Zustimmung auf Akzeptanz zu bewerten.
@@ -96,24 +108,42 @@ Anschließend werden Dir moralische Dilemmata präsentiert. Deine Aufgabe besteh
 Bitte drücke die Leertaste um fortzufahren.""", 0.05)
 
 # Show first dilemmata group
-show_dilemmata(exp, win, '../stimuli/dilemmata0.csv', number_dilemmata=10, number_primes=7, forward=1, prime=1, prime_name=("prime" if subject.group() is "A" else "neutral"), backward=1)
-Emotions.from_window(win).save(exp)
+with tracer.span('dilemmata0', 'phase'):
+    show_dilemmata(exp, win, '../stimuli/dilemmata0.csv', number_dilemmata=10, number_primes=7, forward=1, prime=1, prime_name=("prime" if subject.group() is "A" else "neutral"), backward=1, textures=textures, pools=pools, validate=True, texts=texts, prefetch=7, responses=responses, schedule=schedule['blocks'][0] if schedule is not None else None, catalog=catalog, masks=masks)
+with tracer.span('emotions', 'phase'):
+    Emotions.from_window(win, texts).save(exp)
 
 # Show depriming sequence
-show_movie(win)
-show_complex_shape(win)
-Emotions.from_window(win).save(exp)
+with tracer.span('movie', 'phase'):
+    show_movie(win, exp, texts, buffered=args.buffered_movie)
+with tracer.span('complex_shape', 'phase'):
+    show_complex_shape(win)
+with tracer.span('emotions', 'phase'):
+    Emotions.from_window(win, texts).save(exp)
 
 # Show second dilemmata group
-show_dilemmata(exp, win, '../stimuli/dilemmata1.csv', number_dilemmata=10, number_primes=7, forward=1, prime=1, prime_name=("neutral" if subject.group() is "A" else "prime"), backward=1)
-Emotions.from_window(win).save(exp)
+with tracer.span('dilemmata1', 'phase'):
+    show_dilemmata(exp, win, '../stimuli/dilemmata1.csv', number_dilemmata=10, number_primes=7, forward=1, prime=1, prime_name=("neutral" if subject.group() is "A" else "prime"), backward=1, textures=textures, pools=pools, validate=True, texts=texts, prefetch=7, responses=responses, schedule=schedule['blocks'][1] if schedule is not None else None, catalog=catalog, masks=masks)
+with tracer.span('emotions', 'phase'):
+    Emotions.from_window(win, texts).save(exp)
 
 # Check disgust level
-DSR.from_window(win).save(exp)
+with tracer.span('dsr', 'phase'):
+    DSR.from_window(win, texts).save(exp)
 
 # Show goodby message
-show_text(win, u"""Du hast es geschafft: Vielen Dank für Deine Teilnahme!
+with tracer.span('goodbye', 'phase'):
+    show_text(win, u"""Du hast es geschafft: Vielen Dank für Deine Teilnahme!
 
 Bitte warte ruhig auf die Experimentleitung.""", 0.08)
 
+exp.closeStream()
+responses.close()
 win.close()
+
+# Collect the data centrally, files are kept pending while the coordinator is down. The wide file is written now instead of at the teardown of the experiment.
+if client is not None:
+    exp.saveAsWideText(fileName + '.csv', fileCollisionMethod='overwrite')
+    exp.saveWideText = False
+    client.upload(exp.streamFileName())
+    client.upload(fileName + '.csv')
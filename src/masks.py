@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+import threading
+import numpy
+from PIL import Image
+
+class NoiseMasks:
+    ''' Procedural noise masks matched to the faces, seeded per trial and kept in a small ring buffer shared with the prefetching thread. '''
+
+    def __init__(self, seed, cache, capacity=4):
+        '''
+        Creates a new mask engine.
+        :param number seed: The seed of the session, from which the seeds of the trials are derived.
+        :param TextureCache cache: The cache of the decoded faces the masks are matched to.
+        :param number capacity: The number of masks kept, e.g. those of the current and of the next trial.
+        '''
+        self.__seed = seed
+        self.__cache = cache
+        self.__capacity = capacity
+        self.__masks = OrderedDict()
+        self.__luminance = {}
+        self.__lock = threading.Lock()
+        self.__blocks = 0
+
+    def seed(self):
+        '''
+        Returns the seed of the session.
+        :return number: The seed.
+        '''
+        return self.__seed
+
+    def block(self):
+        '''
+        Reserves the seeds of a new block of trials.
+        :return number: The number of the block.
+        '''
+        self.__blocks += 1
+        return self.__blocks - 1
+
+    def trialSeeds(self, block, trial):
+        '''
+        Derives the seeds of the masks of a trial.
+        :param number block: The number of the block as returned by NoiseMasks.block.
+        :param number trial: The number of the trial in the block.
+        :return tuple: The seeds of the forward and the backward mask.
+        '''
+        base = (self.__seed * 1000003 + block) * 10007 + trial * 2
+        return base % 2 ** 32, (base + 1) % 2 ** 32
+
+    def get(self, seed, face):
+        '''
+        Returns a mask, generating it if it is not in the buffer.
+        :param number seed: The seed of the mask.
+        :param str face: The path of the face whose size and luminance the mask matches.
+        :return Image: The mask.
+        '''
+        image = self.__cache.get(face)
+        key = (seed, image.size)
+        with self.__lock:
+            mask = self.__masks.pop(key, None)
+            luminance = self.__luminance.get(face)
+
+        # Generate outside of the lock, so the other thread is not blocked meanwhile
+        if mask is None and luminance is None:
+            pixels = numpy.asarray(image.convert('L'), dtype=numpy.float32)
+            luminance = (float(pixels.mean()), float(pixels.std()))
+        if mask is None:
+            mask = NoiseMasks.generate(seed, image.size, *luminance)
+
+        # Keep the most recently used masks only
+        with self.__lock:
+            if luminance is not None:
+                self.__luminance[face] = luminance
+            self.__masks[key] = mask
+            while len(self.__masks) > self.__capacity:
+                self.__masks.popitem(last=False)
+        return mask
+
+    def prepare(self, masks):
+        '''
+        Generates masks ahead of the timed sequence, e.g. on the prefetching thread of the TextureCache.
+        :param list masks: [[seed, path of the face], ...]
+        '''
+        for seed, face in masks:
+            self.get(seed, face)
+
+    @staticmethod
+    def generate(seed, size, mean, deviation):
+        '''
+        Generates a greyscale pixel noise.
+        :param number seed: The seed of the noise.
+        :param tuple size: The width and the height in pixels.
+        :param number mean: The mean luminance in [0, 255].
+        :param number deviation: The standard deviation of the luminance.
+        :return Image: The noise.
+        '''
+        width, height = size
+        pixels = numpy.random.RandomState(seed).normal(mean, deviation, (height, width))
+        return Image.fromarray(numpy.clip(pixels, 0, 255).astype(numpy.uint8), 'L')
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from psychopy import visual
+
+import threading
+
+from PIL import Image
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+class BufferedMovie:
+    ''' A silent movie whose frames are decoded ahead by a separate thread. '''
+
+    def __init__(self, window, path, size, pos, buffer=30):
+        '''
+        Opens a movie and starts decoding it.
+        :param visual.Window window: The window in which the movie should be drawn.
+        :param str path: The path of the movie.
+        :param tuple size: The size of the movie.
+        :param tuple pos: The position of the movie.
+        :param number buffer: The maximal number of decoded frames waiting for presentation.
+        :raises ValueError: If the movie could not be opened.
+        '''
+        # OpenCV is already required by visual.MovieStim2
+        import cv2
+
+        self.__capture = cv2.VideoCapture(path)
+        if not self.__capture.isOpened():
+            raise ValueError('Movie path invalid!')
+
+        fps = self.__capture.get(getattr(cv2, 'CAP_PROP_FPS', 5))
+        self.__fps = fps if fps > 0 else 25.0
+        self.__window = window
+        self.__image = visual.ImageStim(window, size=size, pos=pos)
+        self.__frames = Queue(maxsize=buffer)
+        self.__stopped = False
+
+        self.__decoder = threading.Thread(target=self.__decode)
+        self.__decoder.daemon = True
+        self.__decoder.start()
+
+    def fps(self):
+        '''
+        Returns the frame rate of the movie.
+        :return number: The frames per second.
+        '''
+        return self.__fps
+
+    def __decode(self):
+        '''
+        Decodes and converts the frames until the movie ends or is stopped.
+        '''
+        while not self.__stopped:
+            success, frame = self.__capture.read()
+            if not success:
+                break
+
+            # Convert BGR to RGB, keeping 8-bit images which PsychoPy flips and uploads without converting them to floats
+            self.__frames.put(Image.fromarray(frame[:, :, ::-1].copy()))
+        self.__frames.put(None)
+        self.__capture.release()
+
+    def play(self, caption=None):
+        '''
+        Plays the movie synchronized to the flips of the window.
+        :param caption: An optional stimulus drawn above the movie in every frame.
+        :return dict: The number of shown, dropped and late frames.
+        '''
+        frames = dropped = late = 0
+        start = last = None
+        index = -1
+        while True:
+            # Catch up with the frame which is due at the next flip, dropping the ones which are too late
+            target = 0 if start is None else int((last + self.__window.monitorFramePeriod - start) * self.__fps)
+            shown = False
+            while index < target:
+                frame = self.__frames.get()
+                if frame is None:
+                    return {'movie_frames': frames, 'movie_dropped': dropped, 'movie_late': late}
+
+                index += 1
+                if index < target:
+                    dropped += 1
+                else:
+                    self.__image.image = frame
+                    frames += 1
+                    shown = True
+
+            if caption is not None:
+                caption.draw()
+            self.__image.draw()
+            last = self.__window.flip()
+
+            # A frame is late if it was shown after its interval was over
+            if start is None:
+                start = last
+            elif shown and last > start + (index + 1) / self.__fps:
+                late += 1
+
+    def stop(self):
+        '''
+        Stops decoding.
+        '''
+        self.__stopped = True
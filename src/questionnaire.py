@@ -0,0 +1,140 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from psychopy import core, data, event, visual
+
+import random
+
+class Questionnaire:
+    ''' A questionnaire whose items are loaded from a file and paged automatically. '''
+
+    def __init__(self, title, items, buttonText, randomOrder=False, perPage=4, idleFrames=6, groupLabels=False):
+        '''
+        Creates a new questionnaire.
+        :param str title: The overall title.
+        :param list items: [{'name': ..., 'title': ..., 'low': ..., 'high': ..., 'choices': ...}, ...]
+        :param list buttonText: [buttonBefore, buttonAfter].
+        :param bool randomOrder: Check if the order should be randomized on each page.
+        :param number perPage: The maximal number of items on a page.
+        :param number idleFrames: The number of frames between two redraws without mouse input.
+        :param bool groupLabels: Start a new page whenever the scale labels change, so a page shares its labels.
+        :raises ValueError: If the arguments are invalid.
+        '''
+        if len(buttonText) != 2:
+            raise ValueError('Invalid button texts')
+        elif len(items) == 0 or not all(all(key in item for key in ['name', 'title', 'low', 'high', 'choices']) for item in items):
+            raise ValueError('Invalid items')
+
+        self.__title = title
+        self.__items = items
+        self.__buttonText = buttonText
+        self.__randomOrder = randomOrder
+        self.__perPage = perPage
+        self.__idleFrames = idleFrames
+        self.__groupLabels = groupLabels
+        self.__layouts = {}
+
+    def pages(self):
+        '''
+        Splits the items into pages of up to perPage items. With groupLabels, only consecutive items with the same scale labels share a page.
+        :return list: A list of pages, each a list of items.
+        '''
+        pages = []
+        for item in self.__items:
+            page = pages[-1] if len(pages) > 0 else None
+            if page is None or len(page) == self.__perPage or (self.__groupLabels and (page[0]['low'], page[0]['high']) != (item['low'], item['high'])):
+                pages.append([item])
+            else:
+                page.append(item)
+        return pages
+
+    def show(self, window, textCache=None):
+        '''
+        Presents all pages.
+        :param visual.Window window: The window to draw into.
+        :param TextCache textCache: An optional cache for the pre-rendered title.
+        :return dict: A map with the names of the items and their ratings.
+        '''
+        results = {}
+        mouse = event.Mouse(win=window)
+        for page in self.pages():
+            if self.__randomOrder:
+                page = random.sample(page, len(page))
+            results.update(self.__showPage(window, page, textCache, mouse))
+        return results
+
+    def __showPage(self, window, page, textCache, mouse):
+        '''
+        Presents a page until all its items are rated. The page is only redrawn on mouse input and otherwise every few frames.
+        :param visual.Window window: The window to draw into.
+        :param list page: The items of the page.
+        :param TextCache textCache: An optional cache for the pre-rendered title.
+        :param event.Mouse mouse: The mouse of the window.
+        :return dict: A map with the names of the items and their ratings.
+        '''
+        title, scales = self.__layout(window, page, textCache)
+        for scale in scales:
+            scale.reset()
+
+        last = None
+        idle = self.__idleFrames
+        while True:
+            # Bring in pending input events without drawing
+            if hasattr(window.winHandle, 'dispatch_events'):
+                window.winHandle.dispatch_events()
+
+            state = (tuple(mouse.getPos()), tuple(mouse.getPressed()))
+            if state == last and idle < self.__idleFrames:
+                idle += 1
+                core.wait(window.monitorFramePeriod, hogCPUperiod=0)
+                continue
+
+            # Keys are handled by the scales while drawing, so the page is redrawn regularly even without mouse input
+            last = state
+            idle = 0
+            title.draw()
+            for scale in scales:
+                scale.draw()
+            window.flip()
+
+            if all(scale.getRating() is not None for scale in scales[:-1]) and not scales[-1].noResponse:
+                break
+
+        return dict((item['name'], scale.getRating()) for item, scale in zip(page, scales))
+
+    def __layout(self, window, page, textCache):
+        '''
+        Returns the stimuli of a page, creating them on the first request.
+        :param visual.Window window: The window to draw into.
+        :param list page: The items of the page.
+        :param TextCache textCache: An optional cache for the pre-rendered title.
+        :return tuple: The title and the rating scales.
+        '''
+        key = (window, tuple(item['name'] for item in page))
+        if key not in self.__layouts:
+            scales = []
+            yPos = 0.45
+            for i, item in enumerate(page):
+                scales.append(visual.RatingScale(window, textSize=0.8, stretch=1.5, size=0.9, low=0, high=item['choices'] - 1, acceptKeys=['space'], labels=[item['low'], item['high']], scale=item['title'], showAccept=(i == len(page) - 1), pos=(0, yPos), acceptPreText=self.__buttonText[0], acceptSize=2.8, showValue=False, acceptText=self.__buttonText[1]))
+                yPos -= 0.35
+            self.__layouts[key] = scales
+
+        if textCache is not None:
+            title = textCache.get(self.__title, (0, 0.75), 0.075)
+        else:
+            title = visual.TextStim(window, self.__title, pos=(0, 0.75), height=0.075)
+        return title, self.__layouts[key]
+
+    @staticmethod
+    def from_file(file, title, buttonText, randomOrder=False, groupLabels=False):
+        '''
+        Loads the items of a questionnaire from a file.
+        :param str file: The path of the file with the columns name, title, low, high and choices.
+        :param str title: The overall title.
+        :param list buttonText: [buttonBefore, buttonAfter].
+        :param bool randomOrder: Check if the order should be randomized on each page.
+        :param bool groupLabels: Start a new page whenever the scale labels change.
+        :return Questionnaire: The questionnaire.
+        :raises ValueError: If the file does not match the format.
+        '''
+        return Questionnaire(title, data.importConditions(file), buttonText, randomOrder, groupLabels=groupLabels)
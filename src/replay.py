@@ -0,0 +1,508 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# Re-runs recorded sessions without a window and writes regenerated data files, e.g. after a scoring fix.
+# Usage: python replay.py FILE [FILE ...] [--output DIR] [--processes N]
+
+from store import trial_type
+
+import argparse
+import ast
+import csv
+import multiprocessing
+import os
+
+import numpy
+
+PRIME_COLUMNS = ['forward', 'prime', 'backward', 'neutral']
+SUBJECT_COLUMNS = ['id', 'groupt', 'age', 'gender', 'schedule', 'scheduleSeed', 'maskSeed']
+LATENCY_COLUMNS = ['rt_first', 'rt_response', 'rt_source']
+
+# Columns which are written by the ExperimentHandler itself and therefore not copied
+HANDLER_COLUMNS = ['date', 'expName', 'session', 'psychopyVersion', 'frameRate']
+
+def parse(value):
+    '''
+    Restores the type of a recorded value.
+    :param value: The value as written into the data file.
+    :return: The number, boolean or list or the value itself, if it is a text.
+    '''
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+def read_session(path):
+    '''
+    Reads the rows of a recorded session.
+    :param str path: The path of the data file or its stream with the extension ".jsonl".
+    :return list: The rows without empty columns.
+    '''
+    if path.endswith('.jsonl'):
+        from stream import recover
+        rows = recover(path)
+    else:
+        with open(path) as file:
+            rows = list(csv.DictReader(file))
+    return [dict((name, value) for name, value in row.items() if name and value != '' and value is not None) for row in rows]
+
+class Feed:
+    ''' The recorded rows of a session, advanced with every entry of the replayed experiment. '''
+
+    def __init__(self, rows, titles):
+        '''
+        Creates a new feed.
+        :param list rows: The recorded rows.
+        :param dict titles: A map of the titles of the questionnaire items to their names.
+        '''
+        self.__rows = rows
+        self.__titles = titles
+        self.__position = 0
+
+    def row(self):
+        '''
+        Returns the recorded row of the current entry.
+        :return dict: The row.
+        :raises ValueError: If the replay produces more entries than recorded.
+        '''
+        if self.__position >= len(self.__rows):
+            raise ValueError('The replay produced more entries than recorded')
+        return self.__rows[self.__position]
+
+    def next(self):
+        '''
+        Advances to the next row.
+        '''
+        self.__position += 1
+
+    def rating(self, title):
+        '''
+        Returns the recorded rating of a scale.
+        :param str title: The title of the scale, which identifies the items of a questionnaire.
+        :return number: The rating.
+        :raises ValueError: If the row contains no rating for the scale.
+        '''
+        row = self.row()
+        name = self.__titles.get(title)
+        if name is None:
+            name = 'result' if trial_type(row) == 'prime' else 'rating'
+        if name not in row:
+            raise ValueError('No recorded rating "{}"'.format(name))
+        return parse(row[name])
+
+    def timing(self):
+        '''
+        Returns the recorded frame timing of a prime.
+        :return dict: The flip timestamps, durations, dropped frames and seeds of the masks as recorded by Prime.show.
+        '''
+        row = self.row()
+        return dict((name, parse(value)) for name, value in row.items() if name == 'dropped' or name.endswith(('_flips', '_duration', '_dropped', '_seed')))
+
+class ReplayStim(object):
+    ''' A stand-in for a stimulus which draws nothing. '''
+
+    def __init__(self, win=None, *args, **kwargs):
+        '''
+        Creates a new stand-in, accepting the arguments of any stimulus.
+        :param ReplayWindow win: The window.
+        '''
+        self.size = None
+        self.pos = kwargs.get('pos', (0, 0))
+
+    def __setattr__(self, name, value):
+        '''
+        Sets an attribute. A missing size is replaced by the unit size, like an image restoring its original size.
+        '''
+        if name == 'size' and value is None:
+            value = numpy.ones(2)
+        object.__setattr__(self, name, value)
+
+    def draw(self, *args, **kwargs):
+        '''
+        Draws nothing.
+        '''
+        pass
+
+class ReplayRatingScale(ReplayStim):
+    ''' A stand-in for a rating scale which is answered with the recorded rating on its first draw. '''
+
+    # The feed of the process, set while the stimuli are replaced
+    feed = None
+
+    def __init__(self, win=None, *args, **kwargs):
+        '''
+        Creates a new stand-in with the arguments of RatingScale.
+        :param ReplayWindow win: The window.
+        '''
+        ReplayStim.__init__(self, win)
+        self.title = kwargs.get('scale')
+        self.reset()
+
+    def reset(self, *args, **kwargs):
+        '''
+        Waits for a new rating.
+        '''
+        self.noResponse = True
+        self.rating = None
+
+    def draw(self, *args, **kwargs):
+        '''
+        Answers the scale with the recorded rating.
+        '''
+        if self.noResponse:
+            self.rating = ReplayRatingScale.feed.rating(self.title)
+            self.noResponse = False
+
+    def getRating(self):
+        '''
+        Returns the recorded rating.
+        :return number: The rating or None, if the scale was not drawn yet.
+        '''
+        return self.rating
+
+    def getRT(self):
+        '''
+        Returns no reaction time, as the latencies are taken from the recording.
+        :return: None.
+        '''
+        return None
+
+class ReplayMouse:
+    ''' A stand-in for a mouse which never moves. '''
+
+    def __init__(self, *args, **kwargs):
+        '''
+        Creates a new stand-in, accepting the arguments of Mouse.
+        '''
+        pass
+
+    def getPos(self):
+        '''
+        Returns the position of the mouse.
+        :return tuple: The center of the window.
+        '''
+        return (0, 0)
+
+    def getPressed(self):
+        '''
+        Returns the pressed buttons.
+        :return tuple: No pressed buttons.
+        '''
+        return (0, 0, 0)
+
+class ReplayWindow:
+    ''' A stand-in for a window whose flips return immediately. '''
+
+    def __init__(self, period=1.0 / 60):
+        '''
+        Creates a new window.
+        :param number period: The simulated duration of a frame.
+        '''
+        self.monitorFramePeriod = period
+        self.winHandle = object()
+        self.__time = 0.0
+
+    def flip(self, *args, **kwargs):
+        '''
+        Advances the simulated time by a frame.
+        :return number: The simulated timestamp of the flip.
+        '''
+        self.__time += self.monitorFramePeriod
+        return self.__time
+
+class ReplayTextures:
+    ''' A stand-in for a TextureCache which decodes nothing. '''
+
+    def get(self, path):
+        '''
+        Returns the path itself instead of the decoded image.
+        :param str path: The path of the image.
+        :return str: The path.
+        '''
+        return path
+
+    def scale(self, path):
+        '''
+        Returns the factor by which the image was scaled.
+        :param str path: The path of the image.
+        :return number: 1.0
+        '''
+        return 1.0
+
+    def prefetch(self, paths, then=None):
+        '''
+        Decodes nothing.
+        :param list paths: The paths of the images.
+        :param callable then: An optional function, which is called immediately.
+        '''
+        if then is not None:
+            then()
+
+class ReplayCatalog:
+    ''' A stand-in for a StimulusCatalog which accepts the images of the prime list without accessing them, as the faces are not distributed. '''
+
+    def __init__(self, file):
+        '''
+        Creates a new stand-in.
+        :param str file: The path of the prime list.
+        '''
+        self.__basepath = os.path.dirname(os.path.abspath(file))
+
+    def __contains__(self, path):
+        '''
+        Accepts every image.
+        :param str path: The path of the image.
+        :return bool: True.
+        '''
+        return True
+
+    def resolve(self, name):
+        '''
+        Returns the global path of an image without checking it.
+        :param str name: The path relative to the prime list.
+        :return str: The global path.
+        '''
+        return os.path.join(self.__basepath, name)
+
+class ReplayResponses:
+    ''' A stand-in for a ResponseMonitor returning the recorded latencies. '''
+
+    def __init__(self, feed):
+        '''
+        Creates a new stand-in.
+        :param Feed feed: The recorded rows.
+        '''
+        self.__feed = feed
+
+    def start(self):
+        '''
+        Does nothing, as no presses are monitored.
+        '''
+        pass
+
+    def latencies(self, onset, first, response):
+        '''
+        Returns the recorded latencies of the current row instead of the simulated ones.
+        :param number onset: The simulated onset.
+        :param number first: The simulated flip of the first choice.
+        :param number response: The simulated flip of the accepted rating.
+        :return dict: The latencies or nothing, if they were not recorded.
+        '''
+        row = self.__feed.row()
+        return dict((name, parse(row[name])) for name in LATENCY_COLUMNS if name in row)
+
+class ReplayStimuli:
+    ''' Replaces the stimuli of PsychoPy by stand-ins answered from a feed. '''
+
+    def __init__(self, feed):
+        '''
+        Creates a new replacement.
+        :param Feed feed: The recorded rows.
+        '''
+        self.__feed = feed
+
+    def __enter__(self):
+        '''
+        Replaces the stimuli, the mouse and the frame timing of the primes.
+        '''
+        from psychopy import visual, event
+        from stimuli import Prime
+
+        feed = self.__feed
+        measure = Prime.measure
+        self.__replaced = [(visual, name, getattr(visual, name, None)) for name in ['ImageStim', 'TextStim', 'BufferImageStim', 'RatingScale']]
+        self.__replaced += [(event, 'Mouse', event.Mouse), (Prime, 'measure', Prime.__dict__['measure'])]
+
+        def replayedMeasure(phases, offset, period):
+            # Sessions recorded before the timing was measured keep all primes valid
+            timing = feed.timing()
+            return timing if 'dropped' in timing else measure(phases, offset, period)
+
+        visual.ImageStim = visual.TextStim = visual.BufferImageStim = ReplayStim
+        visual.RatingScale = ReplayRatingScale
+        event.Mouse = ReplayMouse
+        Prime.measure = staticmethod(replayedMeasure)
+        ReplayRatingScale.feed = feed
+        return self
+
+    def __exit__(self, *args):
+        '''
+        Restores the replaced attributes.
+        '''
+        for module, name, value in self.__replaced:
+            setattr(module, name, value)
+        ReplayRatingScale.feed = None
+
+def questionnaire_items():
+    '''
+    Loads the items of all questionnaires.
+    :return dict: A map of the types of the rows to the items of their questionnaire.
+    '''
+    from psychopy import data
+
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'stimuli')
+    return dict((kind, data.importConditions(os.path.join(directory, kind + '.csv'))) for kind in ['emotions', 'dsr'])
+
+def questionnaire_titles():
+    '''
+    Loads the titles of the items of all questionnaires.
+    :return dict: A map of the titles to the names of the items.
+    '''
+    return dict((item['title'], item['name']) for items in questionnaire_items().values() for item in items)
+
+def recorded(row, items):
+    '''
+    Checks if a row holds the ratings of all items of a questionnaire.
+    :param dict row: The recorded row.
+    :param list items: The items of the questionnaire.
+    :return bool: True, if every item was rated.
+    '''
+    return all(item['name'] in row for item in items)
+
+def blocks(rows):
+    '''
+    Finds the blocks of primes and dilemmata in the recorded rows.
+    :param list rows: The recorded rows.
+    :return list: The start and the end of each block.
+    '''
+    # Only the dilemmata record their block, so the primes belong to the block of the dilemma following them
+    names = [None] * len(rows)
+    following = None
+    for i in reversed(range(len(rows))):
+        kind = trial_type(rows[i])
+        if kind == 'dilemma':
+            following = rows[i].get('block')
+        elif kind != 'prime':
+            following = None
+        names[i] = following
+
+    # A block lasts until a row of another type or block
+    ranges = []
+    i = 0
+    while i < len(rows):
+        if trial_type(rows[i]) in ['prime', 'dilemma']:
+            end = i
+            while end < len(rows) and trial_type(rows[end]) in ['prime', 'dilemma'] and names[end] == names[i]:
+                end += 1
+            ranges.append((i, end))
+            i = end
+        else:
+            i += 1
+    return ranges
+
+def replay_block(experiment, window, rows, index, group, feed):
+    '''
+    Replays a block of primes and dilemmata through show_dilemmata.
+    :param ReplayExperiment experiment: The replayed experiment.
+    :param ReplayWindow window: The window.
+    :param list rows: The recorded rows of the block.
+    :param number index: The number of the block in the session.
+    :param str group: The group of the subject.
+    :param Feed feed: The recorded rows of the session.
+    '''
+    from session import show_dilemmata
+
+    dilemmata = [row for row in rows if trial_type(row) == 'dilemma']
+    primes = [row for row in rows if trial_type(row) == 'prime' and parse(row.get('replacement', 'False')) is not True]
+    reserve = [row for row in rows if trial_type(row) == 'prime' and parse(row.get('replacement', 'False')) is True]
+    if len(dilemmata) == 0:
+        raise ValueError('Block {} contains no dilemmata'.format(index))
+
+    # Sessions recorded before the condition and the block were stored follow the group
+    condition = dilemmata[0].get('condition', 'prime' if (index == 0) == (group == 'A') else 'neutral')
+    block = dilemmata[0].get('block', 'dilemmata{}.csv'.format(index))
+    schedule = {
+        'dilemmata': [{'dilemma': row['dilemma']} for row in dilemmata],
+        'primes': [dict((column, row[column]) for column in PRIME_COLUMNS) for row in primes],
+        'reserve': [dict((column, row.get('replacement_' + column, row[column])) for column in PRIME_COLUMNS) for row in reserve]
+    }
+    show_dilemmata(experiment, window, os.path.join('..', 'stimuli', block), len(dilemmata), len(primes) // len(dilemmata), 1, 1, condition, 1, textures=ReplayTextures(), validate=True, responses=ReplayResponses(feed), schedule=schedule, catalog=ReplayCatalog(os.path.join('..', 'stimuli', 'primes.csv')))
+
+def replay(rows, output, titles):
+    '''
+    Replays a recorded session.
+    :param list rows: The recorded rows.
+    :param str output: The path of the regenerated data file without extension.
+    :param dict titles: A map of the titles of the questionnaire items to their names.
+    '''
+    from psychopy import data, logging
+    from emotions import Emotions
+    from dsr import DSR
+
+    feed = Feed(rows, titles)
+    items = questionnaire_items()
+    info = dict((name, rows[0][name]) for name in SUBJECT_COLUMNS if name in rows[0])
+
+    class ReplayExperiment(data.ExperimentHandler):
+        ''' An ExperimentHandler advancing the feed with every entry. '''
+
+        def nextEntry(self):
+            '''
+            Finishes the current entry and advances the feed to the next recorded row.
+            '''
+            data.ExperimentHandler.nextEntry(self)
+            feed.next()
+
+    experiment = ReplayExperiment(name='PrimingMeetsDilemma', version='0.1', extraInfo=info, savePickle=False, saveWideText=False, dataFileName=output)
+    window = ReplayWindow()
+    ends = dict(blocks(rows))
+    with ReplayStimuli(feed):
+        i = 0
+        index = 0
+        while i < len(rows):
+            kind = trial_type(rows[i])
+            if i in ends:
+                replay_block(experiment, window, rows[i:ends[i]], index, info.get('groupt'), feed)
+                index += 1
+                i = ends[i]
+                continue
+            elif kind == 'emotions' and recorded(rows[i], items[kind]):
+                Emotions.from_window(window).save(experiment)
+            elif kind == 'dsr' and recorded(rows[i], items[kind]):
+                DSR.from_window(window).save(experiment)
+            else:
+                if kind in items:
+                    # Sessions recorded before the single ratings were stored, like the DS-R before its items, keep their scores
+                    logging.warning('Row {} lacks the ratings of the {} questionnaire and is copied'.format(i, kind))
+                # Rows which need the real hardware, like the movie and the startup, are copied
+                for name in sorted(rows[i]):
+                    if name not in info and name not in HANDLER_COLUMNS and '.' not in name:
+                        experiment.addData(name, parse(rows[i][name]))
+                experiment.nextEntry()
+            i += 1
+
+    experiment.saveAsWideText(output + '.csv')
+
+def replay_file(task):
+    '''
+    Replays a single data file. Runs in a worker process.
+    :param tuple task: [path of the data file, directory of the regenerated file].
+    :return tuple: The path and the error or None, if the replay succeeded.
+    '''
+    path, directory = task
+    try:
+        name = os.path.splitext(os.path.basename(path))[0]
+        replay(read_session(path), os.path.join(directory, name), questionnaire_titles())
+        return path, None
+    except (IOError, ValueError, KeyError) as error:
+        return path, str(error)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replays recorded sessions and writes regenerated data files.')
+    parser.add_argument('files', nargs='+', help='the data files or their streams')
+    parser.add_argument('--output', default='../data/replay', help='the directory of the regenerated data files')
+    parser.add_argument('--processes', type=int, help='the number of worker processes')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+
+    pool = multiprocessing.Pool(args.processes)
+    try:
+        results = pool.map(replay_file, [(path, args.output) for path in args.files], chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    for path, error in results:
+        print('{}: {}'.format(path, error if error is not None else 'replayed'))
@@ -0,0 +1,81 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from psychopy import core, logging
+
+def frame_latencies(onset, first, response):
+    '''
+    Calculates the response latencies from the flips at which the rating changed. They are quantized to the refresh interval.
+    :param number onset: The flip timestamp the latencies are relative to.
+    :param number first: The flip timestamp at which the first choice was visible or None.
+    :param number response: The flip timestamp at which the rating was accepted.
+    :return dict: The latency of the first choice, of the accepted rating and the source of the timestamps.
+    '''
+    return {
+        'rt_first': first - onset if first is not None else response - onset,
+        'rt_response': response - onset,
+        'rt_source': 'frame'
+    }
+
+class ResponseMonitor:
+    ''' Timestamps key and mouse presses at the input device using the ioHub process instead of at the next flip. '''
+
+    def __init__(self):
+        '''
+        Starts the ioHub process. If it is not available, the latencies fall back to the flip timestamps.
+        '''
+        self.__io = None
+        try:
+            from psychopy.iohub import launchHubServer
+
+            # Only presses are monitored, so mouse motion can not overflow the event buffers during long ratings
+            self.__io = launchHubServer(**{
+                'Keyboard': {'monitor_event_types': ['KeyboardPressEvent']},
+                'Mouse': {'monitor_event_types': ['MouseButtonPressEvent']}
+            })
+        except Exception as error:
+            logging.warning('ioHub is not available, response latencies are frame-quantized: {}'.format(error))
+
+        # ioHub uses the absolute clock, the flips are timestamped by the default clock of the log
+        self.__offset = core.getTime() - logging.defaultClock.getTime()
+
+    def source(self):
+        '''
+        Returns the source of the timestamps.
+        :return str: "iohub" or "frame".
+        '''
+        return 'iohub' if self.__io is not None else 'frame'
+
+    def start(self):
+        '''
+        Discards the presses before a new rating.
+        '''
+        if self.__io is not None:
+            self.__io.clearEvents('all')
+
+    def latencies(self, onset, first, response):
+        '''
+        Calculates the response latencies from the presses between the onset and the accepted rating.
+        :param number onset: The flip timestamp the latencies are relative to.
+        :param number first: The flip timestamp at which the first choice was visible or None.
+        :param number response: The flip timestamp at which the rating was accepted.
+        :return dict: The latency of the first press, of the press accepting the rating and the source of the timestamps.
+        '''
+        if self.__io is None:
+            return frame_latencies(onset, first, response)
+
+        # A press always happens before the flip showing its effect
+        presses = sorted(event.time - self.__offset for event in self.__io.devices.keyboard.getEvents() + self.__io.devices.mouse.getEvents())
+        presses = [press for press in presses if onset <= press <= response]
+        if len(presses) == 0:
+            return frame_latencies(onset, first, response)
+
+        return {'rt_first': presses[0] - onset, 'rt_response': presses[-1] - onset, 'rt_source': 'iohub'}
+
+    def close(self):
+        '''
+        Stops the ioHub process.
+        '''
+        if self.__io is not None:
+            self.__io.quit()
+            self.__io = None
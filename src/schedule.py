@@ -0,0 +1,217 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# Compiles the seeded trial schedules of future subjects into an indexed file.
+# Usage: python schedule.py --subjects N [--seed N] [--output FILE]
+
+import argparse
+import csv
+import errno
+import json
+import logging
+import os
+import random
+import re
+import struct
+
+# The identity of a KDEF face: session, gender and number
+FACE = re.compile(r'([AB])([FM])(\d+)')
+
+# An entry of the index: the byte offset of a schedule in the file
+OFFSET = struct.Struct('<Q')
+
+def read_rows(file):
+    '''
+    Reads the rows of a config file.
+    :param str file: The path of the config file.
+    :return list: The rows as dictionaries.
+    '''
+    with open(file) as handle:
+        return list(csv.DictReader(handle))
+
+def face(row):
+    '''
+    Returns the identity of the face shown in a row of the prime list.
+    :param dict row: The row.
+    :return tuple: The gender and the number of the face.
+    :raises ValueError: If the prime is no KDEF face.
+    '''
+    match = FACE.search(os.path.basename(row['prime']))
+    if match is None:
+        raise ValueError('Unknown face: {}'.format(row['prime']))
+    return match.group(2), match.group(3)
+
+def compile_schedule(primes, dilemmata, slot, seed, number_dilemmata=10, number_primes=7):
+    '''
+    Compiles the schedule of a single subject.
+    :param list primes: The rows of the prime list.
+    :param list dilemmata: The rows of the dilemmata per block.
+    :param number slot: The number of the schedule.
+    :param number seed: The seed of all schedules.
+    :param number number_dilemmata: The number of dilemmata per block.
+    :param number number_primes: The number of primes per dilemma.
+    :return dict: The schedule with the primes, the replacements and the dilemmata per block. The replacements are the unshown faces of the block or, if all are shown, those of the next block.
+    :raises ValueError: If the constraints can not be satisfied.
+    '''
+    rng = random.Random(seed * 1000003 + slot)
+    blocks = len(dilemmata)
+
+    # Deal the faces of each gender to the blocks, so no face is shown in two blocks. The block receiving a surplus face alternates between schedules.
+    faces = {}
+    for row in primes:
+        faces.setdefault(face(row), []).append(row)
+    pools = [dict((gender, []) for gender in 'FM') for _ in range(blocks)]
+    for g, gender in enumerate('FM'):
+        identities = sorted(identity for identity in faces if identity[0] == gender)
+        rng.shuffle(identities)
+        for k, identity in enumerate(identities):
+            pools[(slot + g + k) % blocks][gender].extend(faces[identity])
+
+    schedule = {'slot': slot, 'seed': seed, 'blocks': []}
+    shown_per_block = []
+    for pool, rows in zip(pools, dilemmata):
+        if len(rows) < number_dilemmata:
+            raise ValueError('Not enough dilemmata')
+        elif len(pool['F']) + len(pool['M']) < number_dilemmata * number_primes:
+            raise ValueError('Not enough faces for {} blocks'.format(blocks))
+
+        # Alternate the genders, so the shown primes and the replacements are balanced alike
+        for gender in 'FM':
+            rng.shuffle(pool[gender])
+        first, second = rng.sample('FM', 2)
+        balanced = [row for pair in zip(pool[first], pool[second]) for row in pair]
+        shortest = min(len(pool[first]), len(pool[second]))
+        balanced += pool[first][shortest:] + pool[second][shortest:]
+
+        shown = balanced[:number_dilemmata * number_primes]
+        shown_per_block.append(list(shown))
+        rng.shuffle(shown)
+        schedule['blocks'].append({
+            'primes': shown,
+            'reserve': balanced[number_dilemmata * number_primes:],
+            'dilemmata': rng.sample(rows, number_dilemmata)
+        })
+
+    # Without unshown faces, a block is replaced by the faces of the next one, so the reserves of the blocks stay disjoint
+    for i, block in enumerate(schedule['blocks']):
+        if len(block['reserve']) == 0:
+            logging.warning('All faces of block %d are shown, its replacements repeat the faces of block %d', i, (i + 1) % blocks)
+            block['reserve'] = list(shown_per_block[(i + 1) % blocks])
+    return schedule
+
+def compile_schedules(output, primes_file, dilemmata_files, subjects, seed=0, number_dilemmata=10, number_primes=7):
+    '''
+    Compiles the schedules of future subjects into a file of JSON lines and an index of their offsets.
+    :param str output: The path of the schedule file. The index is written to the path with the extension ".idx".
+    :param str primes_file: The path of the prime list.
+    :param list dilemmata_files: The paths of the dilemmata, one per block.
+    :param number subjects: The number of schedules.
+    :param number seed: The seed of the schedules.
+    :param number number_dilemmata: The number of dilemmata per block.
+    :param number number_primes: The number of primes per dilemma.
+    '''
+    primes = read_rows(primes_file)
+    dilemmata = [read_rows(file) for file in dilemmata_files]
+
+    with open(output, 'wb') as file, open(output + '.idx', 'wb') as index:
+        for slot in range(subjects):
+            index.write(OFFSET.pack(file.tell()))
+            line = json.dumps(compile_schedule(primes, dilemmata, slot, seed, number_dilemmata, number_primes), sort_keys=True)
+            file.write((line + '\n').encode('utf-8'))
+
+class Schedule:
+    ''' A compiled file of schedules, which are claimed by the subjects. '''
+
+    def __init__(self, path):
+        '''
+        Opens a schedule file.
+        :param str path: The path of the schedule file.
+        :raises IOError: If the file or its index does not exist.
+        '''
+        self.__path = path
+        self.__claims = path + '.claims'
+        with open(path + '.idx', 'rb') as index:
+            self.__index = index.read()
+
+    def __len__(self):
+        '''
+        Returns the number of schedules.
+        :return number: The number of schedules.
+        '''
+        return len(self.__index) // OFFSET.size
+
+    def get(self, slot):
+        '''
+        Loads a single schedule without reading the others.
+        :param number slot: The number of the schedule.
+        :return dict: The schedule.
+        :raises IndexError: If the schedule does not exist.
+        '''
+        if not 0 <= slot < len(self):
+            raise IndexError('No schedule {}'.format(slot))
+
+        offset, = OFFSET.unpack_from(self.__index, slot * OFFSET.size)
+        with open(self.__path, 'rb') as file:
+            file.seek(offset)
+            return json.loads(file.readline().decode('utf-8'))
+
+    def claims(self):
+        '''
+        Returns the claimed schedules.
+        :return dict: The slots keyed by the ids of their subjects.
+        '''
+        if not os.path.isdir(self.__claims):
+            return {}
+
+        claims = {}
+        for name in os.listdir(self.__claims):
+            with open(os.path.join(self.__claims, name)) as file:
+                claims[file.read()] = int(name)
+        return claims
+
+    def claim(self, subject, slot=None):
+        '''
+        Returns the schedule of a subject, claiming one for new subjects.
+        Each slot is claimed by creating its own file exclusively, so stations sharing the schedule file never claim the same slot.
+        :param str subject: The id of the subject.
+        :param number slot: The slot allocated by the coordinator or None for the first free one.
+        :return dict: The schedule.
+        :raises IndexError: If all schedules or the allocated one are claimed.
+        '''
+        claims = self.claims()
+        if subject in claims:
+            return self.get(claims[subject])
+
+        try:
+            os.makedirs(self.__claims)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+
+        for candidate in ([slot] if slot is not None else range(len(self))):
+            if not 0 <= candidate < len(self) or candidate in claims.values():
+                continue
+            try:
+                descriptor = os.open(os.path.join(self.__claims, str(candidate)), os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+                continue
+            with os.fdopen(descriptor, 'w') as file:
+                file.write(subject)
+            return self.get(candidate)
+        raise IndexError('All schedules are claimed' if slot is None else 'Schedule {} is not available'.format(slot))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compiles the seeded trial schedules of future subjects.')
+    parser.add_argument('--subjects', type=int, required=True, help='the number of schedules')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the schedules')
+    parser.add_argument('--primes', default='../stimuli/primes.csv', help='the prime list')
+    parser.add_argument('--dilemmata', nargs='+', default=['../stimuli/dilemmata0.csv', '../stimuli/dilemmata1.csv'], help='the dilemmata, one file per block')
+    parser.add_argument('--number-dilemmata', type=int, default=10, help='the number of dilemmata per block')
+    parser.add_argument('--number-primes', type=int, default=7, help='the number of primes per dilemma')
+    parser.add_argument('--output', default='../data/schedule.jsonl', help='the schedule file')
+    args = parser.parse_args()
+
+    compile_schedules(args.output, args.primes, args.dilemmata, args.subjects, args.seed, args.number_dilemmata, args.number_primes)
+    print('Compiled {} schedules into {}'.format(args.subjects, args.output))
@@ -0,0 +1,145 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from psychopy import visual, event
+from psychopy.constants import PLAYING
+
+from stimuli import PrimeHandler
+from dilemma import DilemmaHandler
+from movie import BufferedMovie
+from tracing import tracer
+
+from itertools import islice
+
+import os
+
+def show_dilemmata(experiment, window, dilemmata, number_dilemmata, number_primes, forward, prime, prime_name, backward, textures=None, pools=None, validate=False, texts=None, prefetch=0, responses=None, schedule=None, catalog=None, masks=None):
+    '''
+    Shows a number of possible primed dilemmata.
+    :param data.ExperimentHandler experiment: The current experiment
+    :param visual.Window window: The window to draw into.
+    :param number dilemmata: The file from which the dilemmata should be loaded.
+    :param str number_dilemmata: The number of dilemmata which are to be shown.
+    :param number number_primes: The number of primes per dilemma which are to be shown.
+    :param number forward: The number of frames the forward mask will be presented.
+    :param number prime: The number of frames the priem will be presented.
+    :param str prime_name: The name of the column with the prime.
+    :param number backward: The number of frames the backward mask will be presented.
+    :param TextureCache textures: The cache of decoded images shared between the blocks.
+    :param tuple pools: The PrimePool and DilemmaPool of the window, if stimuli should be reused.
+    :param bool validate: Replace primes whose masked sequence dropped frames by unused ones.
+    :param TextCache texts: The cache for the pre-rendered texts of the dilemmata.
+    :param number prefetch: The number of upcoming primes whose images are decoded while the subject rates.
+    :param ResponseMonitor responses: The monitor timestamping the presses at the input device.
+    :param dict schedule: The block of a precompiled schedule, whose trials are shown instead of sampled ones.
+    :param StimulusCatalog catalog: The validated images of the prime list.
+    :param NoiseMasks masks: The engine generating the seeded masks.
+    '''
+    block = os.path.basename(dilemmata)
+    if schedule is not None:
+        dilemmata = DilemmaHandler(dilemmata, number_dilemmata, schedule['dilemmata'])
+        primes = PrimeHandler('../stimuli/primes.csv', number_dilemmata * number_primes, prime_name, textures, schedule['primes'], schedule['reserve'], catalog=catalog, masks=masks)
+    else:
+        dilemmata = DilemmaHandler(dilemmata, number_dilemmata)
+        primes = PrimeHandler('../stimuli/primes.csv', number_dilemmata * number_primes, prime_name, textures, catalog=catalog, masks=masks)
+
+    experiment.addLoop(dilemmata)
+    experiment.addLoop(primes)
+    prime_pool, dilemma_pool = pools if pools is not None else (None, None)
+
+    def idle():
+        # Prepare the upcoming trials while the subject rates a prime
+        with tracer.span('prefetch', 'idle'):
+            primes.prefetch(prefetch)
+            if texts is not None:
+                dilemmata.prefetch(texts, 1)
+
+    # Iterate through dilemmata.
+    for _ in dilemmata:
+        # Show the primes
+        for _ in islice(primes, number_primes):
+            with tracer.span('prime', 'trial', block=block, trial=primes.thisN):
+                current = primes.currentPrime()
+                result = current.show(window, forward, prime, backward, prime_pool, idle, responses)
+                primes.addResult(experiment, result, current.timing())
+
+            # Show replacements until the prime was presented with the planned timing
+            while validate and not current.isValid():
+                with tracer.span('replacement', 'trial', block=block, trial=primes.thisN):
+                    current = primes.replacement()
+                    if current is None:
+                        break
+                    result = current.show(window, forward, prime, backward, prime_pool, idle, responses)
+                    primes.addReplacementResult(experiment, result, current.timing())
+
+        with tracer.span('dilemma', 'trial', block=block, trial=dilemmata.thisN):
+            dilemma = dilemmata.currentDilemma()
+            result = dilemma.show(window, dilemma_pool, texts, responses)
+
+            # Record the condition of the block for the analysis
+            experiment.addData('condition', prime_name)
+            experiment.addData('block', block)
+            dilemmata.addResult(experiment, result, dilemma.timing())
+
+def show_movie(win, experiment=None, texts=None, buffered=False):
+    '''
+    Presents a movie for the de-priming.
+    :param visual.Window win: The window to draw into.
+    :param data.ExperimentHandler experiment: The current experiment, which receives the number of dropped frames.
+    :param TextCache texts: An optional cache holding the pre-rendered caption.
+    :param bool buffered: Decode the movie ahead in a separate thread. The movie is played without sound then.
+    '''
+    if texts is not None:
+        text = texts.get("Eine kleine Pause...", (0, 0.8), 0.1)
+    else:
+        text = visual.TextStim(win, "Eine kleine Pause...", pos=(0, 0.8))
+
+    if buffered:
+        result = BufferedMovie(win, '../stimuli/pause.mp4', size=(640, 480), pos=(0, -0.2)).play(text)
+    else:
+        mov = visual.MovieStim2(win, '../stimuli/pause.mp4', size=(640, 480), pos=(0, -0.2))
+        mov.play()
+
+        # Count the frames of the movie which were skipped between two flips
+        result = {'movie_frames': 0, 'movie_dropped': 0}
+        last = mov.getCurrentFrameNumber()
+        while mov.status == PLAYING:
+            text.draw()
+            mov.draw()
+            win.flip()
+
+            current = mov.getCurrentFrameNumber()
+            if current > last:
+                result['movie_frames'] += 1
+                result['movie_dropped'] += current - last - 1
+            last = current
+
+    if experiment is not None:
+        for name in sorted(result):
+            experiment.addData(name, result[name])
+        experiment.nextEntry()
+
+def show_complex_shape(win):
+    '''
+    Presents a complex shape for the de-priming until space is pressed or 90 seconds are gone.
+    :param visual.Window win: The window to draw into.
+    '''
+    introduction = visual.TextStim(win, u"Bitte zeichne diese komplexe Form innerhalb von 90 Sekunden ab und drücke danach die Leertaste um fortzufahren:", pos=(0, 0.7), height=0.08)
+    shape = visual.ImageStim(win, "../stimuli/complex_shape.png", pos=(0, -0.2))
+    shape.size *= 2.5
+
+    introduction.draw()
+    shape.draw()
+    win.flip()
+
+    event.waitKeys(maxWait=90, keyList=['space'])
+
+def show_text(win, text, frontHeight):
+    '''
+    Present the introduction screen until 'space' is pressed.
+    :param visual.Window win: The window to draw into.
+    :param visual.Window text: The text of the welcome screen.
+    '''
+    visual.TextStim(win, text, height=frontHeight).draw()
+    win.flip()
+    event.waitKeys(keyList=['space'])
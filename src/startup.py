@@ -0,0 +1,106 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from tracing import tracer
+
+import importlib
+import threading
+import timeit
+
+class Background(threading.Thread):
+    ''' A function running in a background thread whose result is fetched later. '''
+
+    def __init__(self, function, *args):
+        '''
+        Starts a function in the background.
+        :param callable function: The function.
+        :param args: The arguments of the function.
+        '''
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.__function = function
+        self.__args = args
+        self.__result = None
+        self.__error = None
+        self.start()
+
+    def run(self):
+        '''
+        Runs the function and keeps its result or error.
+        '''
+        try:
+            self.__result = self.__function(*self.__args)
+        except Exception as error:
+            self.__error = error
+
+    def result(self):
+        '''
+        Waits for the function to finish.
+        :return: The result of the function.
+        :raises Exception: The error raised by the function.
+        '''
+        self.join()
+        if self.__error is not None:
+            raise self.__error
+        return self.__result
+
+def import_modules(names):
+    '''
+    Imports modules, e.g. to warm them up in the background.
+    :param list names: The names of the modules.
+    '''
+    for name in names:
+        importlib.import_module(name)
+
+class StartupTimer:
+    ''' Measures the phases of the start-up. '''
+
+    def __init__(self):
+        '''
+        Starts the measurement.
+        '''
+        self.__start = self.__last = timeit.default_timer()
+        self.__phases = []
+
+    def mark(self, phase):
+        '''
+        Finishes a phase.
+        :param str phase: The name of the phase.
+        '''
+        now = timeit.default_timer()
+        self.__phases.append((phase, now - self.__last))
+        tracer.complete(phase, 'startup', self.__last, now)
+        self.__last = now
+
+    def phases(self):
+        '''
+        Returns the finished phases.
+        :return list: [[name, duration in seconds], ...]
+        '''
+        return list(self.__phases)
+
+    def total(self):
+        '''
+        Returns the duration until the last finished phase.
+        :return number: The duration in seconds.
+        '''
+        return self.__last - self.__start
+
+    def __str__(self):
+        '''
+        Returns a textual breakdown.
+        :return str: A line per phase.
+        '''
+        lines = ['{:<12} {:8.3f}s'.format(phase, duration) for phase, duration in self.__phases]
+        lines.append('{:<12} {:8.3f}s'.format('total', self.total()))
+        return '\n'.join(lines)
+
+    def save(self, exp):
+        '''
+        Saves the breakdown into a running experiment.
+        :param ExperimentHandler exp: The running experiment.
+        '''
+        for phase, duration in self.__phases:
+            exp.addData('startup_' + phase, duration)
+        exp.addData('startup_total', self.total())
+        exp.nextEntry()
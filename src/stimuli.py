@@ -2,53 +2,605 @@
 
 import random
 import os
+import csv
+import functools
+import hashlib
+import json
+import numpy
+import threading
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+from collections import OrderedDict
 
 from psychopy import visual, data, event
+from PIL import Image
+
+from responses import frame_latencies
+from tracing import tracer, traced
+
+# The columns of a prime list holding images
+CONDITION_COLUMNS = ['forward', 'prime', 'backward', 'neutral']
+
+# The columns holding faces, which are the only images needed if the masks are generated
+FACE_COLUMNS = ['prime', 'neutral']
+
+# The resolved paths of the images, so repeated lookups during trials do not touch the file system
+_realpaths = {}
+
+def realpath(path):
+    '''
+    Resolves a path once and returns the remembered result afterwards.
+    :param str path: The path.
+    :return str: The canonical path.
+    '''
+    resolved = _realpaths.get(path)
+    if resolved is None:
+        resolved = _realpaths[path] = os.path.realpath(path)
+    return resolved
+
+class StimulusCatalog:
+    ''' The validated images of a prime list, whose checks are cached in a manifest until the files change. '''
+
+    @traced('StimulusCatalog.__init__')
+    def __init__(self, file, manifest=None, columns=CONDITION_COLUMNS):
+        '''
+        Validates all images of a prime list.
+        :param str file: The path of the prime list.
+        :param str manifest: The path of the manifest or None for the list with the extension ".manifest.json".
+        :param list columns: The columns whose images are used, e.g. FACE_COLUMNS if the masks are generated.
+        :raises ValueError: If an image is missing, broken or does not match the size of the other images in its row.
+        '''
+        self.__basepath = os.path.dirname(os.path.abspath(file))
+        self.__manifest = manifest if manifest is not None else os.path.splitext(file)[0] + '.manifest.json'
+        self.__conditions = data.importConditions(file)
+
+        known = {}
+        if os.path.isfile(self.__manifest):
+            with open(self.__manifest) as cache:
+                known = json.load(cache)
+
+        # Check every image once, reusing the entries of unchanged files
+        self.__images = {}
+        self.__resolved = {}
+        errors = []
+        for name in sorted(set(condition[column] for condition in self.__conditions for column in columns)):
+            path = realpath(os.path.join(self.__basepath, name))
+
+            # The canonical path is looked up during the trials, so it is resolved now as well
+            _realpaths[path] = path
+            try:
+                stat = os.stat(path)
+                entry = known.get(name)
+                if entry is None or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+                    entry = StimulusCatalog.__validate(path, stat)
+            except (IOError, OSError) as error:
+                errors.append('{}: {}'.format(name, error))
+                continue
+            self.__images[name] = entry
+            self.__resolved[name] = path
+        self.__paths = set(self.__resolved.values())
+
+        for condition in self.__conditions:
+            sizes = set((self.__images[condition[column]]['width'], self.__images[condition[column]]['height']) for column in columns if condition[column] in self.__images)
+            if len(sizes) > 1:
+                errors.append('{}: the images differ in size'.format(condition['prime']))
+        if len(errors) > 0:
+            raise ValueError('Invalid stimuli:\n' + '\n'.join(errors))
+
+        if self.__images != known:
+            with open(self.__manifest, 'w') as cache:
+                json.dump(self.__images, cache, indent=2, sort_keys=True)
+
+    @staticmethod
+    def __validate(path, stat):
+        '''
+        Decodes an image and hashes its content.
+        :param str path: The path of the image.
+        :param os.stat_result stat: The status of the file.
+        :return dict: The modification time, the size, the dimensions, the mode and the hash of the image.
+        :raises IOError: If the image can not be decoded.
+        '''
+        image = Image.open(path)
+        image.load()
+        with open(path, 'rb') as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+        return {'mtime': stat.st_mtime, 'size': stat.st_size, 'width': image.size[0], 'height': image.size[1], 'mode': image.mode, 'sha256': digest}
+
+    def __contains__(self, path):
+        '''
+        Checks if a path is a validated image without accessing the file system.
+        :param str path: The path as returned by StimulusCatalog.resolve.
+        :return bool: True, if the image is validated.
+        '''
+        return realpath(path) in self.__paths
+
+    def conditions(self):
+        '''
+        Returns the rows of the prime list.
+        :return list: The rows.
+        '''
+        return list(self.__conditions)
+
+    def paths(self):
+        '''
+        Returns the canonical paths of all images.
+        :return list: The paths.
+        '''
+        return sorted(self.__paths)
+
+    def resolve(self, name):
+        '''
+        Returns the canonical path of an image of the prime list.
+        :param str name: The path relative to the prime list.
+        :return str: The canonical path.
+        :raises ValueError: If the image is not part of the catalog.
+        '''
+        if name not in self.__resolved:
+            raise ValueError('Unknown stimulus: {}'.format(name))
+        return self.__resolved[name]
+
+    def image(self, name):
+        '''
+        Returns the manifest entry of an image.
+        :param str name: The path relative to the prime list.
+        :return dict: The modification time, the size, the dimensions, the mode and the hash of the image.
+        '''
+        return self.__images[name]
+
+class StimulusPack:
+    ''' Preprocessed greyscale images of a prime list, built by stimuli/generator.py. '''
+
+    def __init__(self, file):
+        '''
+        Maps the pack of a prime list into memory. Images which changed since the pack was built are left out and decoded from their files.
+        :param str file: The path of the prime list.
+        :raises IOError: If no pack exists for the list.
+        '''
+        name = os.path.splitext(file)[0]
+        basepath = os.path.dirname(os.path.abspath(file))
+        self.__pixels = numpy.load(name + '.pack.npy', mmap_mode='r')
+
+        self.__index = {}
+        with open(name + '.pack.csv') as index:
+            for row in csv.DictReader(index):
+                path = os.path.realpath(os.path.join(basepath, row['path']))
+                if StimulusPack.current(path, row):
+                    self.__index[path] = (int(row['offset']), int(row['width']), int(row['height']), float(row['scale']))
+
+    def __contains__(self, path):
+        '''
+        Checks if an image is part of the pack.
+        :param str path: The path of the image.
+        :return bool: True, if the image is packed.
+        '''
+        return realpath(path) in self.__index
+
+    def get(self, path):
+        '''
+        Returns a packed image without copying its pixels.
+        :param str path: The path of the image.
+        :return Image: The image.
+        '''
+        offset, width, height, _ = self.__index[realpath(path)]
+        return Image.frombuffer('L', (width, height), self.__pixels[offset:offset + width * height], 'raw', 'L', 0, 1)
+
+    def scale(self, path):
+        '''
+        Returns the factor by which a packed image was already scaled.
+        :param str path: The path of the image.
+        :return number: The factor.
+        '''
+        return self.__index[realpath(path)][3]
+
+    @staticmethod
+    def current(path, row):
+        '''
+        Checks if a packed image was built from the current version of its file.
+        :param str path: The path of the file.
+        :param dict row: The row of the image in the index of the pack.
+        :return bool: True, if the modification time and the size of the file are unchanged. Packs built without them are outdated.
+        '''
+        if not row.get('mtime') or not row.get('size') or not os.path.isfile(path):
+            return False
+        stat = os.stat(path)
+        return stat.st_mtime == float(row['mtime']) and stat.st_size == int(row['size'])
+
+    @staticmethod
+    def find(file):
+        '''
+        Loads the pack of a prime list if it was built.
+        :param str file: The path of the prime list.
+        :return StimulusPack: The pack or None, if it does not exist.
+        '''
+        name = os.path.splitext(file)[0]
+        if os.path.isfile(name + '.pack.npy') and os.path.isfile(name + '.pack.csv'):
+            return StimulusPack(file)
+        return None
+
+class TextureLevels:
+    ''' Chooses texture sizes from the drawn size of the images and a budget of GPU memory, keeping their aspect ratio. '''
+
+    def __init__(self, window_size=None, scale=0.75, budget=32 * 1024 * 1024, resident=6):
+        '''
+        Creates a new TextureLevels.
+        :param tuple window_size: The size of the window in pixels or None, if it is unknown.
+        :param number scale: The factor by which the images are drawn relative to their original size.
+        :param number budget: The maximal number of bytes the resident textures may occupy on the GPU.
+        :param number resident: The number of textures resident at once, e.g. the images of a PrimePool and the masks.
+        '''
+        self.__window_size = window_size
+        self.__scale = scale
+        self.__budget = budget
+        self.__resident = resident
+
+    def size(self, original):
+        '''
+        Chooses the size of the texture of an image.
+        :param tuple original: The original width and height of the image in pixels.
+        :return tuple: The width and the height of the texture, which are never larger than the original ones.
+        '''
+        width, height = [length * min(1.0, self.__scale) for length in original]
+        if self.__window_size is not None:
+            fit = min(1.0, float(self.__window_size[0]) / width, float(self.__window_size[1]) / height)
+            width, height = width * fit, height * fit
+
+        # Drop to smaller mipmap levels until the resident RGBA textures fit into the budget, halving both axes alike
+        level = 1.0
+        while width * height * level ** 2 * 4 * self.__resident > self.__budget and max(width, height) * level > 1:
+            level /= 2
+        return tuple(max(1, int(round(length * level))) for length in (width, height))
+
+class TextureCache:
+    ''' A least-recently-used cache of decoded images keyed by their resolved path. '''
+
+    def __init__(self, budget=256 * 1024 * 1024, pack=None, levels=None):
+        '''
+        Creates a new TextureCache.
+        :param number budget: The maximal number of bytes the decoded images may occupy.
+        :param StimulusPack pack: An optional pack, whose images are used instead of decoding the files.
+        :param TextureLevels levels: An optional choice of texture sizes, to which the images are downsampled once.
+        '''
+        self.__pack = pack
+        self.__levels = levels
+        self.__lock = threading.RLock()
+        self.__budget = budget
+        self.__used = 0
+        self.__images = OrderedDict()
+        self.__scales = {}
+        self.__prefetching = None
+
+    def __contains__(self, path):
+        '''
+        Checks if an image is resident.
+        :param str path: The path of the image.
+        :return bool: True, if the image is already decoded.
+        '''
+        return realpath(path) in self.__images
+
+    def __len__(self):
+        '''
+        Returns the number of resident images.
+        :return number: The number of images.
+        '''
+        return len(self.__images)
+
+    def used(self):
+        '''
+        Returns the memory occupied by the resident images.
+        :return number: The number of bytes.
+        '''
+        return self.__used
+
+    def get(self, path):
+        '''
+        Returns the decoded image, decoding it on the first request.
+        :param str path: The path of the image.
+        :return Image: The decoded image.
+        :raises IOError: If the image could not be decoded.
+        '''
+        # Packed images are mapped into memory and need no decoding.
+        packed = self.__pack is not None and path in self.__pack
+        if packed and self.__levels is None:
+            return self.__pack.get(path)
+
+        key = realpath(path)
+        with self.__lock:
+            image = self.__images.pop(key, None)
+            if image is not None:
+                self.__images[key] = image
+                return image
+
+        # Decode and downsample without blocking other threads using the cache
+        if packed:
+            decoded = self.__pack.get(path)
+            original = [length / self.__pack.scale(path) for length in decoded.size]
+        else:
+            decoded = Image.open(key)
+            decoded.load()
+            original = decoded.size
+
+        if self.__levels is not None:
+            size = self.__levels.size(original)
+            if size != decoded.size:
+                decoded = decoded.resize(size, Image.LANCZOS)
+            self.__scales[key] = numpy.array([float(size[0]) / original[0], float(size[1]) / original[1]])
+
+        with self.__lock:
+            # Another thread may have decoded the image in the meantime
+            image = self.__images.pop(key, None)
+            if image is None:
+                image = decoded
+                self.__used += TextureCache.__bytes(image)
+
+            # Mark the image as most recently used and evict the oldest ones
+            self.__images[key] = image
+            while self.__used > self.__budget and len(self.__images) > 1:
+                _, evicted = self.__images.popitem(last=False)
+                self.__used -= TextureCache.__bytes(evicted)
+        return image
+
+    def preload(self, paths):
+        '''
+        Decodes images ahead of time, e.g. from a background thread.
+        :param list paths: The paths of the images.
+        '''
+        for path in paths:
+            self.get(path)
+
+    def prefetch(self, paths, then=None):
+        '''
+        Decodes images on a worker thread without waiting for them.
+        :param list paths: The paths of the images.
+        :param callable then: An optional function called on the worker thread once the images are decoded.
+        '''
+        with self.__lock:
+            if self.__prefetching is None:
+                self.__prefetching = Queue()
+                worker = threading.Thread(target=self.__prefetch)
+                worker.daemon = True
+                worker.start()
+
+        for path in paths:
+            if path not in self:
+                self.__prefetching.put(path)
+        if then is not None:
+            self.__prefetching.put(then)
+
+    def __prefetch(self):
+        '''
+        Decodes the queued images and calls the queued functions forever.
+        '''
+        while True:
+            task = self.__prefetching.get()
+            try:
+                if callable(task):
+                    task()
+                else:
+                    self.get(task)
+            except IOError:
+                # A broken image is reported when it is requested for a trial
+                pass
+
+    def scale(self, path):
+        '''
+        Returns the factor by which the image returned for a path was already scaled.
+        :param str path: The path of the image.
+        :return: The factor or the factors of the width and the height, if the image was downsampled to a texture level.
+        '''
+        scale = self.__scales.get(realpath(path))
+        if scale is not None:
+            return scale
+        elif self.__pack is not None and path in self.__pack:
+            return self.__pack.scale(path)
+        return 1.0
+
+    @staticmethod
+    def __bytes(image):
+        '''
+        Estimates the memory of a decoded image.
+        :param Image image: The decoded image.
+        :return number: The number of bytes.
+        '''
+        width, height = image.size
+        return width * height * len(image.getbands())
 
 class PrimeHandler(data.TrialHandler):
     ''' A handler for multiple primes loaded from a file. '''
 
-    def __init__(self, file, primes, prime_name = 'prime'):
+    @traced('PrimeHandler.__init__')
+    def __init__(self, file, primes, prime_name = 'prime', cache=None, trials=None, reserve=None, catalog=None, masks=None):
         '''
         Creates a new PrimeHandler.
         :param str file: The path of the config file.
         :param number primes: The number of primes which is to be shown.
         :param str prime_name: The column name holding the prime.
+        :param TextureCache cache: The cache for the images, which may be shared between handlers.
+        :param list trials: The rows of a precompiled schedule, which are shown in order instead of sampling the config file.
+        :param list reserve: The rows of a precompiled schedule which replace invalid presentations in order.
+        :param StimulusCatalog catalog: The validated images of the config file, which resolves the paths without accessing the file system.
+        :param NoiseMasks masks: An optional engine generating seeded masks instead of loading the masks of the config file.
         :raises ValueError: If the paths are not valid files.
         '''
-        primes = random.sample(data.importConditions(file), primes)
+        if trials is None:
+            conditions = catalog.conditions() if catalog is not None else data.importConditions(file)
+            primes = random.sample(conditions, primes)
+
+            # Keep the primes which were not sampled as replacements for invalid presentations
+            sampled = set(id(prime) for prime in primes)
+            unused = [condition for condition in conditions if id(condition) not in sampled]
+            random.shuffle(unused)
+        else:
+            primes = trials[:primes]
+            unused = list(reversed(reserve or []))
 
         # Check if the loaded data matches the format.
         if len(primes[0]) == 4 and 'forward' in primes[0] and 'prime' in primes[0] and 'backward' in primes[0] and 'neutral' in primes[0]:
             self.__basepath = os.path.dirname(os.path.abspath(file))
             self.__prime_name = prime_name
+            self.__catalog = catalog
+            self.__cache = cache if cache is not None else TextureCache(pack=StimulusPack.find(file))
+            self.__unused = unused
+            self.__replacement = None
+            self.__replacements = 0
+            self.__masks = masks
+            self.__block = masks.block() if masks is not None else None
+
             data.TrialHandler.__init__(self, primes, nReps=1, dataTypes=['result'], method="sequential")
         else:
             raise ValueError('Invalid prime list')
 
+    @staticmethod
+    def paths(file, conditions=None, columns=CONDITION_COLUMNS):
+        '''
+        Returns the paths of all images of a config file.
+        :param str file: The path of the config file.
+        :param list conditions: The rows of a precompiled schedule, which are used instead of parsing the config file.
+        :param list columns: The columns whose images are used, e.g. FACE_COLUMNS if the masks are generated.
+        :return list: The absolute paths of the images.
+        '''
+        basepath = os.path.dirname(os.path.abspath(file))
+        if conditions is None:
+            conditions = data.importConditions(file)
+        return sorted(set(os.path.join(basepath, condition[column]) for condition in conditions for column in columns))
+
     def currentPrime(self):
         '''
         Returns the current prime.
         :return Prime: The current Prime
         '''
+        return self.__prime(self.thisTrial, self.thisN)
+
+    def replacement(self):
+        '''
+        Draws a replacement for the current prime from the primes which were not sampled.
+        :return Prime: The replacement or None, if no unused primes are left.
+        '''
+        if len(self.__unused) == 0:
+            return None
+
+        # Replacements follow the trials in the seeds of the masks
+        self.__replacement = self.__unused.pop()
+        self.__replacements += 1
+        return self.__prime(self.__replacement, len(self.trialList) + self.__replacements - 1)
+
+    def prefetch(self, number):
+        '''
+        Decodes the images of the upcoming primes and of the next replacement in the background.
+        :param number number: The number of upcoming primes.
+        '''
+        conditions = self.trialList[self.thisN + 1:self.thisN + 1 + number]
+        if len(self.__unused) > 0:
+            conditions.append(self.__unused[-1])
+
+        # Generated masks need only the faces
+        paths = []
+        for condition in conditions:
+            paths.extend(self.__paths(condition)[1::2] if self.__masks is not None else self.__paths(condition))
+
+        # Generate the masks of the next trial on the worker as well, after its face is decoded
+        prepare = None
+        if self.__masks is not None and self.thisN + 1 < len(self.trialList):
+            face = self.__paths(self.trialList[self.thisN + 1])[1]
+            prepare = functools.partial(self.__masks.prepare, [(seed, face) for seed in self.__masks.trialSeeds(self.__block, self.thisN + 1)])
+        self.__cache.prefetch(paths, prepare)
+
+    def __prime(self, condition, trial):
+        '''
+        Creates the prime of a row in the config file.
+        :param dict condition: The row.
+        :param number trial: The number of the trial, from which the seeds of the masks are derived.
+        :return Prime: The prime.
+        '''
+        forward_path, prime_path, backward_path, neutral_path = self.__paths(condition)
+        seeds = self.__masks.trialSeeds(self.__block, trial) if self.__masks is not None else None
+        return Prime(forward_path, prime_path, backward_path, neutral_path, self.__cache, self.__catalog, self.__masks, seeds)
+
+    def __paths(self, condition):
+        '''
+        Returns the global paths of the images of a row in the config file.
+        :param dict condition: The row.
+        :return list: The paths of the forward mask, the prime, the backward mask and the neutral stimulus.
+        '''
+        if self.__catalog is not None and self.__masks is None:
+            return [self.__catalog.resolve(condition[name]) for name in ['forward', self.__prime_name, 'backward', 'neutral']]
+        elif self.__catalog is not None:
+            # Generated masks replace the images of the masks, which are therefore not part of the catalog
+            masks = [os.path.join(self.__basepath, condition[name]) for name in ['forward', 'backward']]
+            return [masks[0], self.__catalog.resolve(condition[self.__prime_name]), masks[1], self.__catalog.resolve(condition['neutral'])]
+
         # Convert local paths to global paths
-        forward_path = os.path.join(self.__basepath, self.thisTrial['forward'])
-        prime_path = os.path.join(self.__basepath, self.thisTrial[self.__prime_name])
-        backward_path = os.path.join(self.__basepath, self.thisTrial['backward'])
-        neutral_path = os.path.join(self.__basepath, self.thisTrial['neutral'])
-        return Prime(forward_path, prime_path, backward_path, neutral_path)
+        forward_path = os.path.join(self.__basepath, condition['forward'])
+        prime_path = os.path.join(self.__basepath, condition[self.__prime_name])
+        backward_path = os.path.join(self.__basepath, condition['backward'])
+        neutral_path = os.path.join(self.__basepath, condition['neutral'])
+        return [forward_path, prime_path, backward_path, neutral_path]
 
-    def addResult(self, experiment, result):
+    def addResult(self, experiment, result, timing=None):
         '''
         Adds the result of a priming session.
+        :param ExperimentHandler experiment: The running experiment.
+        :param number result: The result of the attractiveness test.
+        :param dict timing: The frame timing of the presentation as returned by Prime.timing.
         '''
         self.addData('result', result)
+        if timing is not None:
+            self.addData('valid', timing['dropped'] == 0)
+            for name in sorted(timing):
+                self.addData(name, timing[name])
+        experiment.nextEntry()
+
+    def addReplacementResult(self, experiment, result, timing=None):
+        '''
+        Adds the result of the last replacement drawn by PrimeHandler.replacement.
+        :param ExperimentHandler experiment: The running experiment.
+        :param number result: The result of the attractiveness test.
+        :param dict timing: The frame timing of the presentation as returned by Prime.timing.
+        '''
+        # The columns of the current trial are filled with the invalid trial by the experiment, so the replacement has its own
+        experiment.addData('replacement', True)
+        for name in ['forward', 'prime', 'backward', 'neutral']:
+            experiment.addData('replacement_' + name, self.__replacement[name])
+
+        experiment.addData('result', result)
+        if timing is not None:
+            experiment.addData('valid', timing['dropped'] == 0)
+            for name in sorted(timing):
+                experiment.addData(name, timing[name])
         experiment.nextEntry()
 
+class PrimePool:
+    ''' Persistent stimuli of a window which are reused by all primes. '''
+
+    def __init__(self, window):
+        '''
+        Creates the image slots and the rating scale once.
+        :param visual.Window window: The window in which the primes should be drawn.
+        '''
+        self.__images = [visual.ImageStim(window) for _ in range(4)]
+        self.__rating = Prime.rating(window)
+
+    def images(self):
+        '''
+        Returns the image slots.
+        :return list: The slots for the forward mask, the prime, the backward mask and the neutral stimulus.
+        '''
+        return self.__images
+
+    def rating(self):
+        '''
+        Returns the rating scale.
+        :return: The rating scale.
+        '''
+        return self.__rating
+
 class Prime:
     ''' A drawable prime. '''
 
-    def __init__(self, forward_path, prime_path, backward_path, neutral_path):
+    def __init__(self, forward_path, prime_path, backward_path, neutral_path, cache=None, catalog=None, masks=None, seeds=None):
         '''
         Creates a new prime.
         :param number id: An id for the prime.
@@ -56,21 +608,55 @@ class Prime:
         :param str neutral_path: The path of the image which is the neutral stimulus.
         :param str prime_path: The path of the image which is the actual prime.
         :param str backward_path: The path of the image which is the backward mask.
+        :param TextureCache cache: An optional cache for the decoded images.
+        :param StimulusCatalog catalog: An optional catalog of validated images, which is checked instead of the file system.
+        :param NoiseMasks masks: An optional engine generating the masks instead of loading their images.
+        :param tuple seeds: The seeds of the generated forward and backward mask.
         :raises ValueError: If the paths are not valid files.
         '''
-        if not os.path.isfile(forward_path):
+        # Generated masks do not need the images of the masks
+        exists = catalog.__contains__ if catalog is not None else os.path.isfile
+        generated = masks is not None and seeds is not None
+        if not generated and not exists(forward_path):
             raise ValueError('Forward path invalid!')
-        elif not os.path.isfile(backward_path):
+        elif not generated and not exists(backward_path):
             raise ValueError('Backward path invalid!')
-        elif not os.path.isfile(prime_path):
+        elif not exists(prime_path):
             raise ValueError('Prime path invalid!')
-        elif not os.path.isfile(neutral_path):
+        elif not exists(neutral_path):
             raise ValueError('Neutral path invalid!')
         else:
             self._forward = forward_path
             self._backward = backward_path
             self._prime = prime_path
             self._neutral = neutral_path
+            self._cache = cache
+            self._masks = masks
+            self._seeds = seeds if masks is not None and seeds is not None else (None, None)
+            self._timing = None
+
+    def _image(self, path, seed=None):
+        '''
+        Returns the image source for a path, using the cache if available.
+        :param str path: The path of the image.
+        :param number seed: The seed of a generated mask replacing the image or None.
+        :return: The decoded image or the path itself.
+        '''
+        if seed is not None:
+            return self._masks.get(seed, self._prime)
+        return self._cache.get(path) if self._cache is not None else path
+
+    def _scale(self, path, seed=None):
+        '''
+        Returns the factor by which the image source for a path was already scaled.
+        :param str path: The path of the image.
+        :param number seed: The seed of a generated mask replacing the image or None.
+        :return: The factor or the factors of the width and the height.
+        '''
+        if seed is not None:
+            # The masks are generated at the size of the decoded prime
+            return self._scale(self._prime)
+        return self._cache.scale(path) if self._cache is not None else 1.0
 
     def prime(self, window):
         '''
@@ -78,7 +664,7 @@ class Prime:
         :param visual.Window window: The window in which the prime should be drawn.
         :return: Drawable prime.
         '''
-        return visual.ImageStim(window, self._prime)
+        return visual.ImageStim(window, self._image(self._prime))
 
     def forward_mask(self, window):
         '''
@@ -86,7 +672,7 @@ class Prime:
         :param visual.Window window: The window in which the prime should be drawn.
         :return: Drawable forward mask.
         '''
-        return visual.ImageStim(window, self._forward)
+        return visual.ImageStim(window, self._image(self._forward, self._seeds[0]))
 
     def backward_mask(self, window):
         '''
@@ -94,7 +680,7 @@ class Prime:
         :param visual.Window window: The window in which the prime should be drawn.
         :return: Drawable forward mask.
         '''
-        return visual.ImageStim(window, self._backward)
+        return visual.ImageStim(window, self._image(self._backward, self._seeds[1]))
 
     def neutral(self, window):
         '''
@@ -102,36 +688,49 @@ class Prime:
         :param visual.Window window: The window in which the prime should be drawn.
         :return: Drawable forward mask.
         '''
-        return visual.ImageStim(window, self._neutral)
+        return visual.ImageStim(window, self._image(self._neutral))
+
+    @staticmethod
+    def rating(window):
+        '''
+        Returns the rating scale for the attractiveness test.
+        :param visual.Window window: The window in which the rating should be drawn.
+        :return: The rating scale.
+        '''
+        return visual.RatingScale(window, high=10, stretch=1.5, acceptKeys=['space'], labels=['Absolut unsympathisch', 'Absolut sympathisch'], scale=None, pos=(0,-0.5), acceptPreText='Bitte bewerte die Sympathie.', showValue=False, acceptSize=2.8, acceptText='Bewertung abgeben')
 
-    def show(self, window, forward_len, prime_len, backward_len):
+    def show(self, window, forward_len, prime_len, backward_len, pool=None, idle=None, responses=None):
         '''
         Shows a prime
         :param visual.Window window: The window in which the prime should be drawn.
         :param number forward_len: The lenght of the forward mask in frames.
         :param number prime_len: The lenght of the prime in frames.
         :param number backward_len: The lenght of the backward mask in frames.
+        :param PrimePool pool: Persistent stimuli of the window which are reused instead of created.
+        :param callable idle: Called once after the masked sequence, while the subject is rating.
+        :param ResponseMonitor responses: An optional monitor timestamping the presses at the input device.
         :return: A result of an attractiveness test.
         '''
-        forward = self.forward_mask(window)
-        backward = self.backward_mask(window)
-        prime = self.prime(window)
-        neutral = self.neutral(window)
-
-        # Adjust size
-        forward.size *= 0.75
-        backward.size *= 0.75
-        prime.size *= 0.75
-        neutral.size *= 0.75
+        if pool is None:
+            forward = self.forward_mask(window)
+            backward = self.backward_mask(window)
+            prime = self.prime(window)
+            neutral = self.neutral(window)
+            rating = Prime.rating(window)
+        else:
+            forward, prime, backward, neutral = pool.images()
+            rating = pool.rating()
+            rating.reset()
 
-        # Adjust position
-        forward.pos = (0, 0.2)
-        backward.pos = (0, 0.2)
-        prime.pos = (0, 0.2)
-        neutral.pos = (0, 0.2)
+            # Swap the images and restore their original size
+            for stimulus, path, seed in [(forward, self._forward, self._seeds[0]), (prime, self._prime, None), (backward, self._backward, self._seeds[1]), (neutral, self._neutral, None)]:
+                stimulus.image = self._image(path, seed)
+                stimulus.size = None
 
-        # Prepare the rating
-        rating = visual.RatingScale(window, high=10, stretch=1.5, acceptKeys=['space'], labels=['Absolut unsympathisch', 'Absolut sympathisch'], scale=None, pos=(0,-0.5), acceptPreText='Bitte bewerte die Sympathie.', showValue=False, acceptSize=2.8, acceptText='Bewertung abgeben')
+        # Adjust size and position
+        for stimulus, path, seed in [(forward, self._forward, self._seeds[0]), (prime, self._prime, None), (backward, self._backward, self._seeds[1]), (neutral, self._neutral, None)]:
+            stimulus.size *= 0.75 / self._scale(path, seed)
+            stimulus.pos = (0, 0.2)
 
         # Predraw all stimuli for performance reasons
         forward.draw()
@@ -139,26 +738,93 @@ class Prime:
         prime.draw()
         neutral.draw()
 
-        # Draw the forward mask.
-        for frame in range(forward_len):
-            forward.draw()
-            rating.draw()
-            window.flip()
+        with tracer.span('sequence', 'prime'):
+            # Draw the forward mask.
+            forward_flips = []
+            for frame in range(forward_len):
+                forward.draw()
+                rating.draw()
+                forward_flips.append(window.flip())
 
-        # Draw the prime.
-        for frame in range(prime_len):
-            prime.draw()
-            rating.draw()
-            window.flip()
+            # Draw the prime.
+            prime_flips = []
+            for frame in range(prime_len):
+                prime.draw()
+                rating.draw()
+                prime_flips.append(window.flip())
 
-        # Draw the backward mask.
-        for frame in range(backward_len):
-            backward.draw()
-            rating.draw()
-            window.flip()
+            # Draw the backward mask.
+            backward_flips = []
+            for frame in range(backward_len):
+                backward.draw()
+                rating.draw()
+                backward_flips.append(window.flip())
 
-        while rating.noResponse:
+            # The first flip of the neutral stimulus marks the end of the masked sequence.
             neutral.draw()
             rating.draw()
-            window.flip()
+            offset = window.flip()
+
+        if responses is not None:
+            responses.start()
+        self._timing = Prime.measure([('forward', forward_len, forward_flips), ('prime', prime_len, prime_flips), ('backward', backward_len, backward_flips)], offset, window.monitorFramePeriod)
+        if self._masks is not None:
+            self._timing.update({'forward_seed': self._seeds[0], 'backward_seed': self._seeds[1]})
+
+        if idle is not None:
+            idle()
+
+        # The response latencies are relative to the offset of the masked sequence
+        first = None
+        response = offset
+        with tracer.span('rating', 'wait'):
+            while rating.noResponse:
+                neutral.draw()
+                rating.draw()
+                response = window.flip()
+                if first is None and rating.getRating() is not None:
+                    first = response
+
+        self._timing.update(responses.latencies(offset, first, response) if responses is not None else frame_latencies(offset, first, response))
         return rating.getRating()
+
+    def timing(self):
+        '''
+        Returns the frame timing of the last presentation.
+        :return dict: The flip timestamps, durations and dropped frames per phase and the response latencies or None, if the prime was not shown yet.
+        '''
+        return self._timing
+
+    def isValid(self):
+        '''
+        Checks if the last presentation kept the planned number of frames in every phase.
+        :return bool: True, if no frame was dropped.
+        '''
+        return self._timing is not None and self._timing['dropped'] == 0
+
+    @staticmethod
+    def measure(phases, offset, period):
+        '''
+        Calculates the measured durations and dropped frames of consecutive phases.
+        :param list phases: [[name, expected frames, [flip timestamps]], ...]
+        :param number offset: The timestamp of the first flip after the last phase.
+        :param number period: The duration of a single frame in seconds.
+        :return dict: The flip timestamps, durations and dropped frames per phase and the total number of dropped frames.
+        '''
+        onsets = [flips[0] if len(flips) > 0 else None for _, _, flips in phases] + [offset]
+
+        timing = {}
+        dropped = 0
+        for i, (name, frames, flips) in enumerate(phases):
+            # A phase lasts until the first flip of the next non-empty phase.
+            end = next(onset for onset in onsets[i + 1:] if onset is not None)
+            duration = end - onsets[i] if onsets[i] is not None else 0.0
+            phase_dropped = max(0, int(round(duration / period)) - frames) if period else 0
+
+            timing[name + '_flips'] = flips
+            timing[name + '_duration'] = duration
+            timing[name + '_dropped'] = phase_dropped
+            dropped += phase_dropped
+
+        timing['dropped'] = dropped
+        return timing
@@ -0,0 +1,183 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# Ingests the data files of all sessions into a columnar store partitioned by subject and trial type.
+# Usage: python store.py [--data DIR] [--store DIR]
+
+import argparse
+import csv
+import glob
+import json
+import os
+
+import numpy
+
+# The column identifying the trial type of a row
+TRIAL_TYPES = [
+    ('prime', 'result'),
+    ('dilemma', 'rating'),
+    ('emotions', 'happiness'),
+    ('dsr', 'coreDisgust'),
+    ('movie', 'movie_frames'),
+    ('startup', 'startup_total')
+]
+
+def trial_type(row):
+    '''
+    Classifies a row of a data file.
+    :param dict row: The row.
+    :return str: The trial type or None, if the row is unknown.
+    '''
+    for name, column in TRIAL_TYPES:
+        if row.get(column, '') != '':
+            return name
+    return None
+
+def to_array(values):
+    '''
+    Converts textual values into the narrowest fitting typed array.
+    :param list values: The values, with '' marking missing ones.
+    :return numpy.ndarray: A boolean, numeric or textual array. Missing numbers are NaN.
+    '''
+    present = [value for value in values if value != '']
+    if len(present) > 0 and all(value in ['True', 'False'] for value in present) and len(present) == len(values):
+        return numpy.array([value == 'True' for value in values], dtype=bool)
+    try:
+        return numpy.array([float(value) if value != '' else numpy.nan for value in values], dtype=float)
+    except ValueError:
+        return numpy.array(values)
+
+def missing(dtype, length):
+    '''
+    Creates an array of missing values.
+    :param numpy.dtype dtype: The type of the values.
+    :param number length: The number of values.
+    :return numpy.ndarray: NaN for numbers and empty values for other types.
+    '''
+    if dtype.kind == 'f':
+        return numpy.full(length, numpy.nan)
+    return numpy.zeros(length, dtype=dtype)
+
+class Store:
+    ''' A columnar store of the results of all sessions. '''
+
+    def __init__(self, directory):
+        '''
+        Opens or creates a store.
+        :param str directory: The directory of the store.
+        '''
+        self.__directory = directory
+        self.__path = os.path.join(directory, 'index.json')
+        if os.path.isfile(self.__path):
+            with open(self.__path) as file:
+                self.__index = json.load(file)
+        else:
+            self.__index = {'sources': {}, 'partitions': {}}
+
+    def ingest(self, paths):
+        '''
+        Reads the data files which are new or changed since the last ingest.
+        :param list paths: The paths of the data files.
+        :return list: The paths which were read.
+        '''
+        read = []
+        for path in paths:
+            stat = os.stat(path)
+            source = os.path.abspath(path)
+            known = self.__index['sources'].get(source)
+            if known is not None and known['mtime'] == stat.st_mtime and known['size'] == stat.st_size:
+                continue
+
+            subject = self.__ingest(path)
+            self.__index['sources'][source] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'subject': subject}
+            read.append(path)
+
+        if len(read) > 0:
+            if not os.path.isdir(self.__directory):
+                os.makedirs(self.__directory)
+            with open(self.__path, 'w') as file:
+                json.dump(self.__index, file, indent=2, sort_keys=True)
+        return read
+
+    def __ingest(self, path):
+        '''
+        Writes the partitions of a single data file.
+        :param str path: The path of the data file.
+        :return str: The subject of the file.
+        '''
+        with open(path) as file:
+            rows = list(csv.DictReader(file))
+
+        subject = rows[0].get('id') if len(rows) > 0 and rows[0].get('id') else os.path.splitext(os.path.basename(path))[0]
+
+        # Group the rows by their trial type, keeping only the columns used by the group
+        groups = {}
+        for row in rows:
+            name = trial_type(row)
+            if name is not None:
+                groups.setdefault(name, []).append(row)
+
+        # Drop the partitions of trial types the file no longer contains
+        for name, partitions in self.__index['partitions'].items():
+            if subject in partitions and name not in groups:
+                os.remove(os.path.join(self.__directory, name, subject + '.npz'))
+                del partitions[subject]
+
+        for name, group in groups.items():
+            columns = sorted(column for column in group[0] if column and any(row.get(column, '') != '' for row in group))
+            directory = os.path.join(self.__directory, name)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            numpy.savez(os.path.join(directory, subject + '.npz'), **dict((column, to_array([row.get(column, '') for row in group])) for column in columns))
+            self.__index['partitions'].setdefault(name, {})[subject] = {'rows': len(group), 'columns': columns}
+        return subject
+
+    def subjects(self, trial_type=None):
+        '''
+        Returns the subjects in the store.
+        :param str trial_type: Only return subjects with rows of this type.
+        :return list: The subjects.
+        '''
+        if trial_type is not None:
+            return sorted(self.__index['partitions'].get(trial_type, {}))
+        return sorted(set(source['subject'] for source in self.__index['sources'].values()))
+
+    def load(self, trial_type, columns=None, subjects=None):
+        '''
+        Loads the rows of a trial type as arrays.
+        :param str trial_type: The trial type, e.g. "prime", "dilemma", "emotions" or "dsr".
+        :param list columns: The columns to load or None for all.
+        :param list subjects: The subjects to load or None for all.
+        :return dict: A map of the column names to arrays of equal length, including the column "subject".
+        '''
+        partitions = self.__index['partitions'].get(trial_type, {})
+        subjects = sorted(partitions) if subjects is None else [subject for subject in subjects if subject in partitions]
+        if columns is None:
+            columns = sorted(set(column for subject in subjects for column in partitions[subject]['columns']))
+
+        chunks = dict((column, []) for column in columns)
+        for subject in subjects:
+            length = partitions[subject]['rows']
+            with numpy.load(os.path.join(self.__directory, trial_type, subject + '.npz')) as partition:
+                for column in columns:
+                    chunks[column].append(partition[column] if column in partition.files else None)
+            chunks.setdefault('subject', []).append(numpy.array([subject] * length))
+
+        result = {}
+        for column, arrays in chunks.items():
+            present = [array for array in arrays if array is not None]
+            if len(present) == 0:
+                continue
+            dtype = numpy.result_type(*present) if all(array.dtype.kind in 'biuf' for array in present) else present[0].dtype
+            lengths = [partitions[subject]['rows'] for subject in subjects]
+            result[column] = numpy.concatenate([array if array is not None else missing(dtype, length) for array, length in zip(arrays, lengths)])
+        return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingests new or changed data files into the columnar store.')
+    parser.add_argument('--data', default='../data', help='the directory of the data files')
+    parser.add_argument('--store', default='../data/store', help='the directory of the store')
+    args = parser.parse_args()
+
+    for path in Store(args.store).ingest(sorted(glob.glob(os.path.join(args.data, '*.csv')))):
+        print('Ingested {}'.format(path))
@@ -0,0 +1,114 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from psychopy import data
+
+import atexit
+import json
+import os
+import threading
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+class StreamWriter(threading.Thread):
+    ''' A background thread appending entries as JSON lines to a file. '''
+
+    def __init__(self, path):
+        '''
+        Creates and starts a new StreamWriter.
+        :param str path: The path of the file which is appended to.
+        '''
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.__path = path
+        self.__queue = Queue()
+        self.__closed = False
+        self.start()
+
+    def path(self):
+        '''
+        Returns the path of the file.
+        :return str: The path.
+        '''
+        return self.__path
+
+    def write(self, entry):
+        '''
+        Queues an entry without blocking.
+        :param dict entry: The entry.
+        '''
+        self.__queue.put(entry)
+
+    def close(self):
+        '''
+        Writes all queued entries and stops the thread.
+        '''
+        if not self.__closed:
+            self.__closed = True
+            self.__queue.put(None)
+            self.join()
+
+    def run(self):
+        '''
+        Appends the queued entries until the writer is closed.
+        '''
+        with open(self.__path, 'a') as file:
+            while True:
+                entry = self.__queue.get()
+                if entry is None:
+                    break
+
+                file.write(json.dumps(entry, sort_keys=True, default=str) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+
+class StreamingExperimentHandler(data.ExperimentHandler):
+    ''' An ExperimentHandler which additionally streams every entry to a crash-safe file. '''
+
+    def __init__(self, *args, **kwargs):
+        '''
+        Creates a new StreamingExperimentHandler with the arguments of ExperimentHandler.
+        The entries are appended to the data file name with the extension ".jsonl".
+        '''
+        data.ExperimentHandler.__init__(self, *args, **kwargs)
+        self.__writer = StreamWriter(self.dataFileName + '.jsonl')
+        atexit.register(self.closeStream)
+
+    def nextEntry(self):
+        '''
+        Finishes the current entry and queues it for writing.
+        '''
+        data.ExperimentHandler.nextEntry(self)
+        self.__writer.write(dict(self.entries[-1]))
+
+    def streamFileName(self):
+        '''
+        Returns the path of the streamed file.
+        :return str: The path.
+        '''
+        return self.__writer.path()
+
+    def closeStream(self):
+        '''
+        Writes all queued entries and closes the stream.
+        '''
+        self.__writer.close()
+
+def recover(path):
+    '''
+    Loads the entries of a possibly interrupted stream.
+    :param str path: The path of the stream.
+    :return list: The complete entries.
+    '''
+    entries = []
+    with open(path) as file:
+        for line in file:
+            # The last line may be truncated if the session crashed while writing
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+    return entries
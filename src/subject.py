@@ -1,5 +1,3 @@
-from psychopy import gui
-
 import hashlib
 import base64
 import time
@@ -62,25 +60,35 @@ class Subject:
         return {'id': self._id, 'groupt': self._group, 'age': self._age, 'gender': self._gender}
 
     @staticmethod
-    def from_dialog():
+    def generate_id():
+        '''
+        Generates an unique id based on the current time.
+        :return str: The id.
+        '''
+        current_time = str(time.time() * 1000)
+        hash_str = str(hashlib.pbkdf2_hmac('sha256', current_time, b'christopher', 100000, 32))
+        return base64.b32encode(hash_str)[:10]
+
+    @staticmethod
+    def from_dialog(id=None, group=None):
         '''
         Loads the subject data from a GUI.
+        :param str id: An id generated in advance or None, if it should be generated now.
+        :param str group: A group allocated in advance or None, if it should be chosen in the dialog.
         :return Subject: The subject or False on error.
         '''
-        def generate_id():
-            '''
-            Generates an unique id based on the current time.
-            '''
-            current_time = str(time.time() * 1000)
-            hash_str = str(hashlib.pbkdf2_hmac('sha256', current_time, b'christopher', 100000, 32))
-            return base64.b32encode(hash_str)[:10]
+        # The GUI toolkit is slow to load and only required here
+        from psychopy import gui
 
         dlg = gui.Dlg(title="Willkommen!", labelButtonOK='Starten', labelButtonCancel='Beenden')
         dlg.addText('Herzlich willkommen zu unserem Experiment!')
         dlg.addText('Bitte starte es erst, wenn du dazu aufgefordert wirst.')
 
-        dlg.addFixedField("Anonyme ID:", generate_id())
-        dlg.addField('Gruppe:', choices=["A", "B"])
+        dlg.addFixedField("Anonyme ID:", id if id is not None else Subject.generate_id())
+        if group is not None:
+            dlg.addFixedField('Gruppe:', group)
+        else:
+            dlg.addField('Gruppe:', choices=["A", "B"])
         dlg.addField('Alter:')
         dlg.addField('Geschlecht:', choices=["Frau", "Mann"])
 
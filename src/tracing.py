@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from contextlib import contextmanager
+
+import functools
+import json
+import os
+import threading
+import timeit
+
+class Tracer:
+    ''' Collects the spans of a session as trace events, which can be opened in chrome://tracing or Perfetto. '''
+
+    def __init__(self):
+        '''
+        Creates a new, disabled tracer.
+        '''
+        self.__enabled = False
+        self.__events = []
+        self.__threads = {}
+        self.__pid = os.getpid()
+
+    def enable(self):
+        '''
+        Starts recording spans.
+        '''
+        self.__enabled = True
+
+    def enabled(self):
+        '''
+        Checks if spans are recorded.
+        :return bool: True, if the tracer is enabled.
+        '''
+        return self.__enabled
+
+    @contextmanager
+    def span(self, name, category='session', **args):
+        '''
+        Records the duration of a block of code.
+        :param str name: The name of the span.
+        :param str category: The category, e.g. "phase", "trial" or "setup".
+        :param args: Additional values shown with the span.
+        '''
+        if not self.__enabled:
+            yield
+            return
+
+        start = timeit.default_timer()
+        try:
+            yield
+        finally:
+            self.complete(name, category, start, timeit.default_timer(), **args)
+
+    def complete(self, name, category, start, end, **args):
+        '''
+        Records a span which was measured elsewhere.
+        :param str name: The name of the span.
+        :param str category: The category.
+        :param number start: The start as returned by timeit.default_timer.
+        :param number end: The end as returned by timeit.default_timer.
+        :param args: Additional values shown with the span.
+        '''
+        if not self.__enabled:
+            return
+
+        thread = threading.current_thread()
+        self.__threads[thread.ident] = thread.name
+        self.__events.append({'name': name, 'cat': category, 'ph': 'X', 'ts': start * 1e6, 'dur': (end - start) * 1e6, 'pid': self.__pid, 'tid': thread.ident, 'args': args})
+
+    def save(self, path):
+        '''
+        Writes the recorded spans as trace event JSON.
+        :param str path: The path of the file.
+        '''
+        names = [{'name': 'thread_name', 'ph': 'M', 'pid': self.__pid, 'tid': ident, 'args': {'name': name}} for ident, name in self.__threads.items()]
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': names + sorted(self.__events, key=lambda event: event['ts']), 'displayTimeUnit': 'ms'}, file, default=str)
+
+# The tracer of the process, enabled by the session
+tracer = Tracer()
+
+def traced(name, category='setup'):
+    '''
+    Decorates a function, so every call is recorded as a span.
+    :param str name: The name of the span.
+    :param str category: The category of the span.
+    :return callable: The decorator.
+    '''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
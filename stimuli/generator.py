@@ -2,25 +2,289 @@
 
 # This script generates an appropriated primes.csv for the experiment.
 # Usage: python generator.py > primes.csv
+#        python generator.py --output primes.csv (keeps the masks of the faces already listed)
+#        python generator.py --pack primes.csv (writes primes.pack.npy and primes.pack.csv)
 
+from concurrent.futures import ProcessPoolExecutor
+
+import argparse
+import csv
 import glob
+import hashlib
+import json
+import os
 import re
 import random
+import sys
 
 regex = re.compile('.*([A|B])([F|M])(\d+)NESGREY\.JPG$')
 noise = ["noise01.png", "noise02.png", "noise03.png", "noise04.png"]
 
-# Print the header
-print('forward,prime,backward,neutral')
+# The factor by which the stimuli are scaled in the experiment
+SCALE = 0.75
+
+# The directory of the build cache next to the faces, which keeps the results of unchanged images between runs
+CACHE = '.build'
+
+
+def stamp(path):
+    '''
+    Returns what identifies the version of a file.
+    :param str path: The path of the file.
+    :return list: The modification time and the size.
+    '''
+    status = os.stat(path)
+    return [status.st_mtime, status.st_size]
+
+
+class BuildCache:
+    ''' The results of the last build per image, valid as long as the modification time and the size of the images are unchanged. '''
+
+    def __init__(self, directory=CACHE):
+        '''
+        Loads the cache and creates its directory, so the workers are able to store their results in it.
+        :param str directory: The directory of the cache.
+        '''
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index = os.path.join(directory, 'index.json')
+        try:
+            with open(self.index) as file:
+                self.entries = json.load(file)
+        except (IOError, ValueError):
+            self.entries = {}
+
+    def valid(self, kind, paths):
+        '''
+        Checks if a result was built from the current version of its images.
+        :param str kind: The kind of the result, e.g. "validate".
+        :param list paths: The paths of the images.
+        :return bool: True, if the result is cached and none of the images changed.
+        '''
+        entry = self.entries.get('{}:{}'.format(kind, '|'.join(paths)))
+        return entry is not None and entry['stamps'] == [stamp(path) for path in paths]
+
+    def get(self, kind, paths):
+        '''
+        Returns a cached result.
+        :param str kind: The kind of the result.
+        :param list paths: The paths of the images.
+        :return: The result, which may be None.
+        :raises KeyError: If the result is not cached.
+        '''
+        return self.entries['{}:{}'.format(kind, '|'.join(paths))]['result']
+
+    def drop(self, kind, paths):
+        '''
+        Removes a result, so it is built again.
+        :param str kind: The kind of the result.
+        :param list paths: The paths of the images.
+        '''
+        self.entries.pop('{}:{}'.format(kind, '|'.join(paths)), None)
+
+    def put(self, kind, paths, result):
+        '''
+        Stores a result of the current version of its images.
+        :param str kind: The kind of the result.
+        :param list paths: The paths of the images.
+        :param result: The result, which must be serializable as JSON.
+        '''
+        self.entries['{}:{}'.format(kind, '|'.join(paths))] = {'stamps': [stamp(path) for path in paths], 'result': result}
+
+    def array(self, path):
+        '''
+        Returns the path of the preprocessed pixels of an image.
+        :param str path: The path of the image.
+        :return str: The path of the pixels in the cache.
+        '''
+        return os.path.join(self.directory, hashlib.sha1(path.encode('utf-8')).hexdigest() + '.npy')
+
+    def save(self):
+        '''
+        Writes the index of the cache atomically.
+        '''
+        with open(self.index + '.tmp', 'w') as file:
+            json.dump(self.entries, file)
+        os.replace(self.index + '.tmp', self.index)
+
+
+def validate(pair):
+    '''
+    Checks that both faces of a pair decode and have the same size. Runs in a worker process.
+    :param tuple pair: The paths of the neutral face and of the prime.
+    :return str: The error or None, if the pair is valid.
+    '''
+    from PIL import Image
+
+    sizes = []
+    for path in pair:
+        try:
+            with Image.open(path) as image:
+                image.load()
+                sizes.append(image.size)
+        except (IOError, OSError) as error:
+            return 'Unable to decode {}: {}'.format(path, error)
+    if sizes[0] != sizes[1]:
+        return 'Different sizes of {} and {}'.format(*pair)
+    return None
+
+
+def preprocess(task):
+    '''
+    Decodes, converts and scales an image and stores its pixels. Runs in a worker process.
+    :param tuple task: The path of the image and the path of its pixels in the cache.
+    :return tuple: The width and the height of the scaled image.
+    '''
+    import numpy
+    from PIL import Image
+
+    source, target = task
+    image = Image.open(source).convert('L')
+    width, height = (int(round(length * SCALE)) for length in image.size)
+    numpy.save(target, numpy.asarray(image.resize((width, height), Image.LANCZOS), dtype=numpy.uint8).ravel())
+    return width, height
+
+
+def build(cache, kind, tasks, function, workers=None):
+    '''
+    Runs a function in parallel on the tasks whose images changed since the last build.
+    :param BuildCache cache: The cache of the results.
+    :param str kind: The kind of the results.
+    :param list tasks: [[paths of the images, argument of the function], ...]
+    :param callable function: A function at module level, which is called in the worker processes.
+    :param number workers: The number of processes or None for one per processor.
+    :return dict: The results keyed by the tuple of the paths of their images.
+    '''
+    results = {}
+    stale = []
+    for paths, argument in tasks:
+        if cache.valid(kind, paths):
+            results[tuple(paths)] = cache.get(kind, paths)
+        else:
+            stale.append((paths, argument))
+
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for (paths, _), result in zip(stale, executor.map(function, [argument for _, argument in stale], chunksize=16)):
+                cache.put(kind, paths, result)
+                results[tuple(paths)] = result
+        cache.save()
+    print('{}: {} cached, {} processed'.format(kind, len(tasks) - len(stale), len(stale)), file=sys.stderr)
+    return results
+
+
+def read_masks(primes):
+    '''
+    Reads the masks already assigned to the primes of an existing list.
+    :param str primes: The path of the list or None.
+    :return dict: The forward and the backward mask keyed by the prime.
+    '''
+    if primes is None or not os.path.isfile(primes):
+        return {}
+    with open(primes, newline='') as file:
+        return dict((row['prime'], (row['forward'], row['backward'])) for row in csv.DictReader(file))
+
+
+def generate(output=None, workers=None):
+    '''
+    Lists the valid pairs of faces in ./faces with a forward and a backward mask each.
+    :param str output: The path of the list, whose masks are kept for the faces it already lists, or None to print it.
+    :param number workers: The number of processes validating the pairs.
+    '''
+    masks = read_masks(output)
+
+    # Search all neutral faces and their partners showing disgust
+    pairs = []
+    for path in sorted(glob.iglob('./faces/*NESGREY.JPG')):
+        f = regex.match(path)
+        if f:
+            gender = f.group(2)
+            neutral = 'faces/{}{}{}NESGREY.JPG'.format(f.group(1), gender, f.group(3))
+            prime = 'faces/{}{}{}DISGREY.JPG'.format(f.group(1), gender, f.group(3))
+            if os.path.isfile(prime):
+                pairs.append((neutral, prime))
+            else:
+                print('Skipping {}: {} is missing'.format(neutral, prime), file=sys.stderr)
+
+    # Validate the pairs whose images changed since the last run
+    tasks = [([os.path.abspath(path) for path in pair], pair) for pair in pairs]
+    errors = build(BuildCache(), 'validate', tasks, validate, workers)
+
+    rows = []
+    for paths, pair in tasks:
+        error = errors[tuple(paths)]
+        if error is not None:
+            print('Skipping {}: {}'.format(pair[0], error), file=sys.stderr)
+            continue
+
+        # Keep the masks of listed faces, so rebuilding the list does not change them
+        neutral, prime = pair
+        if prime in masks:
+            forward, backward = masks[prime]
+        else:
+            forward, backward = ('noise/{}'.format(mask) for mask in random.sample(noise, 2))
+        rows.append('{},{},{},{}'.format(forward, prime, backward, neutral))
+
+    # Print the header and the rows
+    file = open(output, 'w') if output is not None else sys.stdout
+    try:
+        print('forward,prime,backward,neutral', file=file)
+        for row in rows:
+            print(row, file=file)
+    finally:
+        if output is not None:
+            file.close()
+
+
+def pack(primes, workers=None):
+    '''
+    Builds the pack of the images of a list of primes.
+    :param str primes: The path of the list. The pack is written next to it.
+    :param number workers: The number of processes preprocessing the images.
+    '''
+    # Pillow and NumPy are only required for building the pack
+    import numpy
+
+    base = os.path.dirname(os.path.abspath(primes))
+    with open(primes, newline='') as file:
+        paths = sorted(set(row[column] for row in csv.DictReader(file) for column in ['forward', 'prime', 'backward', 'neutral']))
+
+    # Decode, convert and scale every changed image once and store them consecutively
+    cache = BuildCache()
+    kind = 'pack{}'.format(SCALE)
+    sources = [os.path.join(base, path) for path in paths]
+    for source in sources:
+        if not os.path.isfile(cache.array(source)):
+            cache.drop(kind, [source])
+    sizes = build(cache, kind, [([source], (source, cache.array(source))) for source in sources], preprocess, workers)
+
+    chunks = []
+    index = []
+    offset = 0
+    for path, source in zip(paths, sources):
+        width, height = sizes[(source,)]
+        pixels = numpy.load(cache.array(source))
+        chunks.append(pixels)
+        index.append((path, offset, width, height, stamp(source)))
+        offset += pixels.size
+
+    name = os.path.splitext(primes)[0]
+    numpy.save(name + '.pack.npy', numpy.concatenate(chunks))
+    with open(name + '.pack.csv', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['path', 'offset', 'width', 'height', 'scale', 'mtime', 'size'])
+        for path, offset, width, height, (mtime, size) in index:
+            writer.writerow([path, offset, width, height, SCALE, repr(mtime), size])
+
 
-# Search all neutral faces
-for path in glob.iglob('./faces/*NESGREY.JPG'):
-    f = regex.match(path)
-    if f:
-        masks = random.sample(noise, 2)
-        gender = f.group(2)
-        neutral = 'faces/{}{}{}NESGREY.JPG'.format(f.group(1), gender, f.group(3))
-        prime = 'faces/{}{}{}DISGREY.JPG'.format(f.group(1), gender, f.group(3))
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates the list of primes or a preprocessed pack of its images.')
+    parser.add_argument('--pack', metavar='CSV', help='build the pack of the images listed in the given primes.csv')
+    parser.add_argument('--output', metavar='CSV', help='write the list to the given file, keeping the masks of the faces it already lists')
+    parser.add_argument('--workers', type=int, help='the number of processes validating and preprocessing the images')
+    args = parser.parse_args()
 
-        # Print the current row
-        print('noise/{},{},noise/{},{}'.format(masks[0], prime, masks[1], neutral))
+    if args.pack:
+        pack(args.pack, args.workers)
+    else:
+        generate(args.output, args.workers)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import importlib
+import os
+import sys
+
+import pytest
+
+# The modules of the experiment and the generator of the stimuli are imported like in their directories
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'stimuli'))
+
+# The error of the first failed import, as a later import may pass on a half-initialized PsychoPy
+FAILED = []
+
+@pytest.fixture
+def experiment_module():
+    '''
+    Imports modules which need PsychoPy, skipping the test if it can not be loaded, e.g. without a display.
+    :return callable: A function importing a module by its name.
+    '''
+    def load(name):
+        if len(FAILED) == 0:
+            try:
+                return importlib.import_module(name)
+            except Exception as error:
+                FAILED.append(error)
+        pytest.skip('PsychoPy is not available: {}'.format(FAILED[0]))
+    return load
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+@pytest.fixture
+def primes(tmpdir):
+    '''
+    Writes a prime list of a single pair of faces whose noise masks are missing.
+    '''
+    tmpdir.mkdir('faces')
+    for name in ['AF01DISGREY.JPG', 'AF01NESGREY.JPG']:
+        Image.new('L', (40, 60), 128).save(str(tmpdir.join('faces', name)), 'JPEG')
+    path = str(tmpdir.join('primes.csv'))
+    with open(path, 'w') as file:
+        file.write('forward,prime,backward,neutral\n')
+        file.write('noise/noise01.png,faces/AF01DISGREY.JPG,noise/noise02.png,faces/AF01NESGREY.JPG\n')
+    return path
+
+def test_generated_masks_need_no_images(experiment_module, primes):
+    stimuli = experiment_module('stimuli')
+    with pytest.raises(ValueError):
+        stimuli.StimulusCatalog(primes)
+
+    catalog = stimuli.StimulusCatalog(primes, columns=stimuli.FACE_COLUMNS)
+    assert len(catalog.paths()) == 2
+
+def test_paths_are_resolved_when_the_catalog_is_built(experiment_module, primes, monkeypatch):
+    stimuli = experiment_module('stimuli')
+    catalog = stimuli.StimulusCatalog(primes, columns=stimuli.FACE_COLUMNS)
+
+    def resolve(path):
+        raise AssertionError('{} is resolved during the trials'.format(path))
+    monkeypatch.setattr(os.path, 'realpath', resolve)
+    assert catalog.resolve('faces/AF01DISGREY.JPG') in catalog
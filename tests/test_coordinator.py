@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+from coordinator import CoordinatorClient, write_json
+
+import os
+
+def test_allocations_are_kept_until_confirmed(tmpdir):
+    # The coordinator is down, so the reserved allocations are used
+    cache = os.path.join(str(tmpdir), 'coordinator.json')
+    write_json(cache, {'reserved': [{'id': 'a', 'group': 'A'}, {'id': 'b', 'group': 'B'}], 'pending': []})
+    client = CoordinatorClient('http://127.0.0.1:9', cache, timeout=0.1)
+
+    first = client.allocate()
+    assert first == {'id': 'a', 'group': 'A'}
+    assert CoordinatorClient('http://127.0.0.1:9', cache, timeout=0.1).allocate() == first
+
+    client.confirm(first)
+    assert CoordinatorClient('http://127.0.0.1:9', cache, timeout=0.1).allocate() == {'id': 'b', 'group': 'B'}
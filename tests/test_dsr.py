@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+def test_scores_reverse_items(experiment_module):
+    dsr = experiment_module('dsr')
+    scores = dsr.score([[0] * 27, [4] * 27])
+
+    # The reversed items 0, 5 and 9 count 4 for a rating of 0
+    assert list(scores['coreDisgust']) == [8.0 / 12, 40.0 / 12]
+    assert list(scores['animalReminderDisgust']) == [4.0 / 8, 28.0 / 8]
+    assert list(scores['contaminationDisgust']) == [0.0, 4.0]
+    assert list(scores['overallDisgust']) == [12.0 / 25, 88.0 / 25]
+
+def test_catch_items_decide_reliability(experiment_module):
+    dsr = experiment_module('dsr')
+    ratings = [[2] * 27 for _ in range(3)]
+    ratings[0][11], ratings[0][15] = 3, 1
+    ratings[1][11], ratings[1][15] = 2, 1
+    ratings[2][11], ratings[2][15] = 4, 2
+    assert list(dsr.score(ratings)['isReliable']) == [True, False, False]
+
+def test_invalid_ratings(experiment_module):
+    dsr = experiment_module('dsr')
+    with pytest.raises(ValueError):
+        dsr.score([[0] * 26])
+    with pytest.raises(ValueError):
+        dsr.score([[5] * 27])
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import os
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from generator import BuildCache, build, generate, validate
+
+def face(directory, name, size=(40, 60)):
+    '''
+    Writes a grey face.
+    '''
+    path = os.path.join(directory, 'faces', name)
+    Image.new('L', size, 128).save(path, 'JPEG')
+    return path
+
+@pytest.fixture
+def stimuli(tmpdir, monkeypatch):
+    tmpdir.mkdir('faces')
+    tmpdir.mkdir('noise')
+    for number in range(1, 5):
+        Image.new('L', (40, 60), 128).save(str(tmpdir.join('noise', 'noise0{}.png'.format(number))))
+    monkeypatch.chdir(tmpdir)
+    return str(tmpdir)
+
+def test_cache_detects_changed_images(stimuli):
+    path = face(stimuli, 'AF01NESGREY.JPG')
+    cache = BuildCache()
+    assert not cache.valid('validate', [path])
+
+    cache.put('validate', [path], None)
+    assert cache.valid('validate', [path])
+    assert cache.get('validate', [path]) is None
+
+    face(stimuli, 'AF01NESGREY.JPG', (80, 120))
+    assert not cache.valid('validate', [path])
+
+def test_valid_pairs_are_cached(stimuli, capsys):
+    pair = [face(stimuli, 'AF01NESGREY.JPG'), face(stimuli, 'AF01DISGREY.JPG')]
+    assert build(BuildCache(), 'validate', [(pair, pair)], validate, 1) == {tuple(pair): None}
+    assert build(BuildCache(), 'validate', [(pair, pair)], validate, 1) == {tuple(pair): None}
+    assert capsys.readouterr().err.splitlines() == ['validate: 0 cached, 1 processed', 'validate: 1 cached, 0 processed']
+
+def test_invalid_pairs_are_skipped(stimuli):
+    face(stimuli, 'AF01NESGREY.JPG')
+    face(stimuli, 'AF01DISGREY.JPG')
+    face(stimuli, 'AF02NESGREY.JPG')
+    face(stimuli, 'AM01NESGREY.JPG')
+    face(stimuli, 'AM01DISGREY.JPG', (80, 120))
+    generate('primes.csv', 1)
+
+    with open('primes.csv') as file:
+        assert [row['prime'] for row in csv.DictReader(file)] == ['faces/AF01DISGREY.JPG']
+
+def test_masks_are_kept_across_builds(stimuli):
+    for number in range(1, 9):
+        face(stimuli, 'AF0{}NESGREY.JPG'.format(number))
+        face(stimuli, 'AF0{}DISGREY.JPG'.format(number))
+    generate('primes.csv', 1)
+    with open('primes.csv') as file:
+        first = list(csv.DictReader(file))
+
+    face(stimuli, 'AF09NESGREY.JPG')
+    face(stimuli, 'AF09DISGREY.JPG')
+    generate('primes.csv', 1)
+    with open('primes.csv') as file:
+        second = list(csv.DictReader(file))
+
+    assert second[:len(first)] == first
+    assert second[-1]['prime'] == 'faces/AF09DISGREY.JPG'
+
+def test_pack_records_the_versions_of_its_images(stimuli):
+    numpy = pytest.importorskip('numpy')
+    from generator import pack
+
+    face(stimuli, 'AF01NESGREY.JPG')
+    face(stimuli, 'AF01DISGREY.JPG')
+    generate('primes.csv', 1)
+    pack('primes.csv', 1)
+
+    with open('primes.pack.csv') as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 4
+    for row in rows:
+        stat = os.stat(row['path'])
+        assert (float(row['mtime']), int(row['size'])) == (stat.st_mtime, stat.st_size)
+        assert (int(row['width']), int(row['height'])) == (30, 45)
+    assert numpy.load('primes.pack.npy').size == 4 * 30 * 45
+
+def test_pack_of_a_fresh_checkout(stimuli):
+    numpy = pytest.importorskip('numpy')
+    from generator import CACHE, pack
+
+    face(stimuli, 'AF01NESGREY.JPG')
+    face(stimuli, 'AF01DISGREY.JPG')
+    with open('primes.csv', 'w') as file:
+        file.write('forward,prime,backward,neutral\n')
+        file.write('noise/noise01.png,faces/AF01DISGREY.JPG,noise/noise02.png,faces/AF01NESGREY.JPG\n')
+    assert not os.path.exists(CACHE)
+
+    pack('primes.csv', 1)
+    assert numpy.load('primes.pack.npy').size == 4 * 30 * 45
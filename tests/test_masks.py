@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from masks import NoiseMasks
+
+class Faces:
+    ''' A stand-in for a TextureCache holding a single face. '''
+
+    def __init__(self):
+        self.face = Image.linear_gradient('L').resize((40, 60))
+
+    def get(self, path):
+        return self.face
+
+def test_same_seed_gives_the_same_mask():
+    first = NoiseMasks.generate(7, (40, 60), 128, 30)
+    assert first.size == (40, 60)
+    assert first.tobytes() == NoiseMasks.generate(7, (40, 60), 128, 30).tobytes()
+    assert first.tobytes() != NoiseMasks.generate(8, (40, 60), 128, 30).tobytes()
+
+def test_recorded_seeds_reproduce_the_masks():
+    session = NoiseMasks(1234, Faces())
+    block = session.block()
+    seeds = session.trialSeeds(block, 3)
+    session.prepare([(seed, 'face') for seed in seeds])
+    shown = [session.get(seed, 'face') for seed in seeds]
+
+    # The seed of the session is recorded, from which a replay derives the seeds of the trials again
+    replay = NoiseMasks(session.seed(), Faces())
+    assert replay.trialSeeds(replay.block(), 3) == seeds
+    assert [mask.tobytes() for mask in shown] == [replay.get(seed, 'face').tobytes() for seed in seeds]
+    assert seeds[0] != seeds[1] and shown[0].tobytes() != shown[1].tobytes()
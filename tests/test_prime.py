@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+PERIOD = 1.0 / 60
+
+def test_planned_frames_are_valid(experiment_module):
+    Prime = experiment_module('stimuli').Prime
+    timing = Prime.measure([('forward', 1, [0.0]), ('prime', 1, [PERIOD]), ('backward', 1, [2 * PERIOD])], 3 * PERIOD, PERIOD)
+    assert timing['dropped'] == 0
+    assert timing['prime_duration'] == pytest.approx(PERIOD)
+
+def test_late_flips_are_dropped_frames(experiment_module):
+    Prime = experiment_module('stimuli').Prime
+    timing = Prime.measure([('forward', 1, [0.0]), ('prime', 1, [PERIOD]), ('backward', 1, [3 * PERIOD])], 4 * PERIOD, PERIOD)
+    assert (timing['forward_dropped'], timing['prime_dropped'], timing['backward_dropped']) == (0, 1, 0)
+    assert timing['dropped'] == 1
+
+def test_empty_phases_last_until_the_next_one(experiment_module):
+    Prime = experiment_module('stimuli').Prime
+    timing = Prime.measure([('forward', 2, [0.0, PERIOD]), ('prime', 0, []), ('backward', 1, [2 * PERIOD])], 3 * PERIOD, PERIOD)
+    assert timing['prime_duration'] == 0.0
+    assert timing['forward_duration'] == pytest.approx(2 * PERIOD)
+    assert timing['dropped'] == 0
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+STIMULI = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'stimuli')
+
+def layout(questionnaire, name, **options):
+    items = questionnaire.Questionnaire.from_file(os.path.join(STIMULI, name), 'Title', ['Before', 'After'], **options)
+    return [len(page) for page in items.pages()]
+
+def test_emotions_share_one_page(experiment_module):
+    questionnaire = experiment_module('questionnaire')
+    assert layout(questionnaire, 'emotions.csv', randomOrder=True) == [4]
+
+def test_dsr_pages_follow_the_labels(experiment_module):
+    questionnaire = experiment_module('questionnaire')
+    assert layout(questionnaire, 'dsr.csv', groupLabels=True) == [4, 4, 4, 2, 4, 4, 4, 1]
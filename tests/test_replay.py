@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import os
+
+from replay import blocks
+
+def session(block_names, separator=True, record_block=True):
+    '''
+    Builds the rows of a session like main.py records them: 7 primes per dilemma and 10 dilemmata per block.
+    '''
+    rows = [{'startup_total': '1.0'}]
+    for name in block_names:
+        for d in range(10):
+            rows.extend({'prime': 'faces/AF01DISGREY.JPG', 'result': '4'} for _ in range(7))
+            dilemma = {'dilemma': 'Dilemma {}'.format(d), 'rating': '3'}
+            if record_block:
+                dilemma['block'] = name
+            rows.append(dilemma)
+        if separator:
+            rows.append({'movie_frames': '100'})
+    return rows
+
+def test_primes_belong_to_the_block_of_their_dilemma():
+    rows = session(['dilemmata0.csv', 'dilemmata1.csv'])
+    assert blocks(rows) == [(1, 81), (82, 162)]
+
+def test_adjacent_blocks_are_split():
+    rows = session(['dilemmata0.csv', 'dilemmata1.csv'], separator=False)
+    assert blocks(rows) == [(1, 81), (81, 161)]
+
+def test_replacements_stay_in_their_block():
+    rows = session(['dilemmata0.csv'])
+    rows.insert(2, {'prime': 'faces/AM01DISGREY.JPG', 'result': '2', 'replacement': 'True'})
+    assert blocks(rows) == [(1, 82)]
+
+def test_sessions_without_recorded_blocks():
+    rows = session(['dilemmata0.csv', 'dilemmata1.csv'], record_block=False)
+    assert blocks(rows) == [(1, 81), (82, 162)]
+
+def test_archived_sessions_are_replayed_without_faces(experiment_module, tmpdir, monkeypatch):
+    replay = experiment_module('replay')
+    monkeypatch.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+    # Sessions recorded before the items of the DS-R were stored only hold its scores
+    rows = session(['dilemmata0.csv'])
+    for row in rows:
+        if 'result' in row:
+            row.update({'forward': 'noise/noise01.png', 'backward': 'noise/noise02.png', 'neutral': 'faces/AF01NESGREY.JPG'})
+    rows.append({'coreDisgust': '2.0', 'overallDisgust': '2.0'})
+    replay.replay(rows, str(tmpdir.join('session')), replay.questionnaire_titles())
+
+    with open(str(tmpdir.join('session.csv'))) as file:
+        replayed = list(csv.DictReader(file))
+    assert [row['coreDisgust'] for row in replayed if row.get('coreDisgust')] == ['2.0']
+    assert len([row for row in replayed if row.get('result')]) == 70
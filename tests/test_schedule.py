@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+from schedule import Schedule, compile_schedule, compile_schedules, face, read_rows
+
+import os
+
+import pytest
+
+STIMULI = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'stimuli')
+PRIMES = read_rows(os.path.join(STIMULI, 'primes.csv'))
+DILEMMATA = [read_rows(os.path.join(STIMULI, name)) for name in ['dilemmata0.csv', 'dilemmata1.csv']]
+
+def test_blocks_show_distinct_faces():
+    for slot in range(3):
+        first, second = compile_schedule(PRIMES, DILEMMATA, slot, 0)['blocks']
+        assert len(first['primes']) == len(second['primes']) == 70
+        assert len(first['dilemmata']) == len(second['dilemmata']) == 10
+        assert not set(face(row) for row in first['primes']) & set(face(row) for row in second['primes'])
+
+def test_shown_faces_are_balanced():
+    for slot in range(3):
+        for block in compile_schedule(PRIMES, DILEMMATA, slot, 0)['blocks']:
+            # With 35 identities per gender, one block receives the surplus face of each gender
+            genders = [face(row)[0] for row in block['primes']]
+            assert abs(genders.count('F') - genders.count('M')) <= 2
+
+def test_every_block_has_replacements():
+    for slot in range(3):
+        for block in compile_schedule(PRIMES, DILEMMATA, slot, 0)['blocks']:
+            assert len(block['reserve']) > 0
+            shown = set(face(row) for row in block['primes'])
+            assert not any(face(row) in shown for row in block['reserve'])
+
+def test_reserves_are_disjoint():
+    for slot in range(3):
+        first, second = compile_schedule(PRIMES, DILEMMATA, slot, 0)['blocks']
+        assert not set(face(row) for row in first['reserve']) & set(face(row) for row in second['reserve'])
+
+def test_unshown_faces_are_reserved():
+    # With a single row per face, each block receives 76 faces of which 70 are shown
+    rows = [{'prime': 'faces/A{}{:02d}DISGREY.JPG'.format(gender, number)} for gender in 'FM' for number in range(76)]
+    first, second = compile_schedule(rows, DILEMMATA, 0, 0)['blocks']
+    shown = set(face(row) for block in [first, second] for row in block['primes'])
+    assert len(first['reserve']) == len(second['reserve']) == 6
+    assert not any(face(row) in shown for row in first['reserve'] + second['reserve'])
+
+def test_schedules_are_reproducible():
+    assert compile_schedule(PRIMES, DILEMMATA, 4, 7) == compile_schedule(PRIMES, DILEMMATA, 4, 7)
+    assert compile_schedule(PRIMES, DILEMMATA, 4, 7) != compile_schedule(PRIMES, DILEMMATA, 5, 7)
+
+def test_stations_claim_distinct_schedules(tmpdir):
+    path = os.path.join(str(tmpdir), 'schedule.jsonl')
+    compile_schedules(path, os.path.join(STIMULI, 'primes.csv'), [os.path.join(STIMULI, name) for name in ['dilemmata0.csv', 'dilemmata1.csv']], 3)
+
+    # Each station opens the shared schedule on its own
+    first, second = Schedule(path), Schedule(path)
+    assert first.claim('a')['slot'] == 0
+    assert second.claim('b')['slot'] == 1
+    assert second.claim('a')['slot'] == 0
+
+    # The slot allocated by the coordinator is taken, unless another subject claimed it
+    assert first.claim('c', 2)['slot'] == 2
+    with pytest.raises(IndexError):
+        second.claim('d', 1)
+    with pytest.raises(IndexError):
+        second.claim('d')
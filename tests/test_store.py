@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+from store import Store, trial_type
+
+import csv
+import os
+
+def write_session(path, subject, ratings):
+    '''
+    Writes a data file with a prime and a dilemma per rating.
+    '''
+    with open(path, 'w') as file:
+        writer = csv.DictWriter(file, ['id', 'prime', 'result', 'valid', 'dilemma', 'rating'])
+        writer.writeheader()
+        for rating in ratings:
+            writer.writerow({'id': subject, 'prime': 'faces/AF01DISGREY.JPG', 'result': rating, 'valid': 'True'})
+            writer.writerow({'id': subject, 'dilemma': 'Dilemma', 'rating': rating})
+
+def test_trial_types():
+    assert trial_type({'result': '3'}) == 'prime'
+    assert trial_type({'rating': '3', 'dilemma': 'Dilemma'}) == 'dilemma'
+    assert trial_type({'movie_frames': '100'}) == 'movie'
+    assert trial_type({'notes': ''}) is None
+
+def test_only_new_or_changed_files_are_ingested(tmpdir):
+    first, second = str(tmpdir.join('s1.csv')), str(tmpdir.join('s2.csv'))
+    write_session(first, 's1', [1, 2])
+    write_session(second, 's2', [3])
+    store = os.path.join(str(tmpdir), 'store')
+
+    assert Store(store).ingest([first, second]) == [first, second]
+    assert Store(store).ingest([first, second]) == []
+
+    write_session(second, 's2', [3, 4, 5])
+    assert Store(store).ingest([first, second]) == [second]
+    assert Store(store).subjects('dilemma') == ['s1', 's2']
+
+def test_columns_are_typed(tmpdir):
+    path = str(tmpdir.join('s1.csv'))
+    write_session(path, 's1', [1, 2])
+    store = Store(os.path.join(str(tmpdir), 'store'))
+    store.ingest([path])
+
+    primes = store.load('prime', ['result', 'valid'])
+    assert primes['result'].dtype.kind == 'f' and list(primes['result']) == [1.0, 2.0]
+    assert primes['valid'].dtype == bool and primes['valid'].all()
+    assert list(primes['subject']) == ['s1', 's1']
+
+def test_missing_columns_are_filled(tmpdir):
+    first, second = str(tmpdir.join('s1.csv')), str(tmpdir.join('s2.csv'))
+    write_session(first, 's1', [1])
+    with open(second, 'w') as file:
+        file.write('id,result\ns2,4\n')
+    store = Store(os.path.join(str(tmpdir), 'store'))
+    store.ingest([first, second])
+
+    primes = store.load('prime', ['result', 'valid'])
+    assert list(primes['subject']) == ['s1', 's2']
+    assert list(primes['result']) == [1.0, 4.0]
+    assert list(primes['valid']) == [True, False]
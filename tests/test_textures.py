@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+@pytest.fixture
+def images(tmpdir):
+    '''
+    Writes grey images of 10x10 pixels, each occupying 100 bytes once decoded.
+    '''
+    paths = []
+    for name in ['a', 'b', 'c']:
+        path = os.path.join(str(tmpdir), name + '.png')
+        Image.new('L', (10, 10), 128).save(path)
+        paths.append(path)
+    return paths
+
+def test_decoded_images_are_reused(experiment_module, images):
+    stimuli = experiment_module('stimuli')
+    cache = stimuli.TextureCache()
+    a = images[0]
+
+    assert a not in cache
+    image = cache.get(a)
+    assert a in cache
+    assert cache.get(a) is image
+    assert len(cache) == 1 and cache.used() == 100
+
+def test_least_recently_used_images_are_evicted(experiment_module, images):
+    stimuli = experiment_module('stimuli')
+    cache = stimuli.TextureCache(budget=250)
+    a, b, c = images
+
+    cache.get(a)
+    cache.get(b)
+    cache.get(a)
+    cache.get(c)
+    assert a in cache and c in cache and b not in cache
+    assert len(cache) == 2 and cache.used() == 200
+
+def test_images_exceeding_the_budget_are_kept_alone(experiment_module, images):
+    stimuli = experiment_module('stimuli')
+    cache = stimuli.TextureCache(budget=50)
+    a, b, _ = images
+
+    cache.get(a)
+    assert a in cache
+    cache.get(b)
+    assert b in cache and a not in cache
+    assert len(cache) == 1
+
+def test_texture_levels_keep_the_aspect_ratio(experiment_module):
+    stimuli = experiment_module('stimuli')
+
+    # The faces are drawn at three quarters of their size without being upsampled or distorted
+    assert stimuli.TextureLevels(scale=0.75).size((562, 762)) == (422, 572)
+    assert stimuli.TextureLevels(scale=1.5).size((562, 762)) == (562, 762)
+    assert stimuli.TextureLevels((281, 1080), scale=1.0).size((562, 762)) == (281, 381)
+
+def test_texture_levels_fit_into_the_budget(experiment_module):
+    stimuli = experiment_module('stimuli')
+    width, height = stimuli.TextureLevels(scale=0.75, budget=6 * 4 * 150 * 150, resident=6).size((562, 762))
+    assert width * height <= 150 * 150
+    assert (width, height) == (105, 143)